@@ -0,0 +1,108 @@
+import os
+import json
+import hashlib
+import threading
+
+import jvmprofiles
+
+# Class data sharing archives, next to config.json
+ARCHIVE_FOLDER = "cds-archives"
+
+# Training runs that may end without an archive before giving up on a
+# version, a game that is killed or crashes never writes one
+MAX_ATTEMPTS = 3
+
+# First Java with dynamic archives (-XX:ArchiveClassesAtExit)
+MIN_JAVA = 13
+
+ATTEMPTS_FILE = "attempts.json"
+
+_attempts_lock = threading.Lock()
+
+
+def _classpath(jvm_args):
+    for flag in ("-cp", "-classpath", "--class-path"):
+        if flag in jvm_args:
+            index = jvm_args.index(flag)
+            if index + 1 < len(jvm_args):
+                return jvm_args[index + 1]
+    return None
+
+
+def archive_path(plan, folder=ARCHIVE_FOLDER):
+    """Archive of a launch plan, None when the plan can't use one.
+
+    Named <version+loader+java>-<classpath>. The JVM only accepts an
+    archive for the exact jars it was made from, so the second half also
+    covers their sizes and mtimes. A new classpath means a new archive and
+    the old one is dropped on the next training run."""
+    classpath = _classpath(plan["jvm_args"])
+    version = plan.get("version")
+    java_version = plan.get("java_version")
+    if not classpath or not version or not java_version:
+        return None
+    group = hashlib.sha1(f"{version}\0{plan['java']}\0{java_version}".encode()).hexdigest()[:16]
+    stamps = json.dumps(plan.get("fingerprint", {}), sort_keys=True)
+    digest = hashlib.sha1(f"{classpath}\0{stamps}".encode()).hexdigest()[:16]
+    # Absolute, java runs in the instance's game directory
+    return os.path.abspath(os.path.join(folder, f"{group}-{digest}.jsa"))
+
+
+def load_attempts(folder=ARCHIVE_FOLDER):
+    try:
+        with open(os.path.join(folder, ATTEMPTS_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_attempts(attempts, folder=ARCHIVE_FOLDER):
+    path = os.path.join(folder, ATTEMPTS_FILE)
+    try:
+        with open(path + ".tmp", "w") as f:
+            json.dump(attempts, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Error saving class data sharing attempts: {e}")
+
+
+def drop_stale_archives(archive, attempts):
+    # Other archives of the same version and java were for an older classpath
+    folder, name = os.path.split(archive)
+    group = name.split("-")[0]
+    for other in os.listdir(folder):
+        if other.startswith(group + "-") and other.endswith(".jsa") and other != name:
+            try:
+                os.remove(os.path.join(folder, other))
+            except OSError:
+                pass
+    for other in list(attempts):
+        if other.startswith(group + "-") and other != name:
+            del attempts[other]
+
+
+def cds_args(plan, folder=ARCHIVE_FOLDER):
+    """(JVM arguments, mode) for a launch of plan.
+
+    mode is "archive" when a trained archive is used, "training" when this
+    launch records one at exit and None when class data sharing is off for
+    it. The JVM checks the archive itself and runs without it if it doesn't
+    match, so a stale archive never stops the game."""
+    if jvmprofiles.java_major(plan.get("java_version") or "") < MIN_JAVA:
+        return [], None
+    archive = archive_path(plan, folder)
+    if archive is None:
+        return [], None
+    if os.path.isfile(archive) and os.path.getsize(archive) > 0:
+        return [f"-XX:SharedArchiveFile={archive}"], "archive"
+
+    os.makedirs(folder, exist_ok=True)
+    name = os.path.basename(archive)
+    with _attempts_lock:
+        attempts = load_attempts(folder)
+        if attempts.get(name, 0) >= MAX_ATTEMPTS:
+            return [], None
+        attempts[name] = attempts.get(name, 0) + 1
+        drop_stale_archives(archive, attempts)
+        save_attempts(attempts, folder)
+    return [f"-XX:ArchiveClassesAtExit={archive}"], "training"
@@ -0,0 +1,226 @@
+import os
+import copy
+import json
+import atexit
+import threading
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+
+CONFIG_FILE = "config.json"
+
+# Seconds a change waits for more changes before config.json is written
+SAVE_DELAY = 0.5
+
+# Milliseconds the watcher waits for a burst of file events to settle
+RELOAD_DELAY_MS = 200
+
+
+class ConfigStore:
+    """config.json, parsed once and kept in memory.
+
+    Reads never touch the disk. Changes are coalesced and written together
+    SAVE_DELAY seconds after the first one, through a temporary file that
+    is synced and renamed over config.json so a crash never leaves half a
+    file behind. One writer at a time, from any thread.
+
+    Reads like the dict it replaces: get, [], in. Assigning a key
+    schedules a save, modify() does a read-modify-write under the lock.
+    reload() takes in changes other programs made to the file, keys with
+    a save still pending keep the value set here."""
+
+    def __init__(self, path=CONFIG_FILE, save_delay=SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self.data = {}
+        # Guards data, the write lock only orders writes to the file
+        self.lock = threading.RLock()
+        self.write_lock = threading.Lock()
+        self.save_timer = None
+        self.dirty = False
+        # Keys changed here since the last write
+        self.pending_keys = set()
+        self.listeners = []
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Reads config.json, json.JSONDecodeError/OSError are left to the caller."""
+        with open(self.path, "r") as config_file:
+            data = json.load(config_file)
+        with self.lock:
+            self.data = data
+            self.dirty = False
+            self.pending_keys = set()
+
+    def subscribe(self, callback):
+        # callback(keys) after reload() changed keys, on the reloading thread
+        self.listeners.append(callback)
+
+    def reload(self):
+        """Reads the file again, returns the keys whose value changed."""
+        # Not while a write is on its way, the file would be older than memory
+        with self.write_lock:
+            try:
+                with open(self.path, "r") as config_file:
+                    disk = json.load(config_file)
+            except (OSError, ValueError) as e:
+                # Half written by someone else, the next event brings the rest
+                print(f"Error reloading {self.path}: {e}")
+                return set()
+            with self.lock:
+                for key in self.pending_keys:
+                    if key in self.data:
+                        disk[key] = self.data[key]
+                changed = {key for key in set(disk) | set(self.data) if disk.get(key) != self.data.get(key)}
+                self.data = disk
+        if changed:
+            for callback in list(self.listeners):
+                callback(changed)
+        return changed
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self.data.get(key, default)
+
+    def __getitem__(self, key):
+        with self.lock:
+            return self.data[key]
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.data
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def snapshot(self):
+        with self.lock:
+            return copy.deepcopy(self.data)
+
+    def update(self, values):
+        with self.lock:
+            self.data.update(values)
+            self.pending_keys.update(values)
+            self.schedule_save()
+
+    def replace(self, data):
+        with self.lock:
+            self.pending_keys.update(set(self.data) | set(data))
+            self.data = dict(data)
+            self.schedule_save()
+
+    def modify(self, key, func, default=None):
+        """Sets key to func(current value) and returns the new value."""
+        with self.lock:
+            value = func(self.data.get(key, default))
+            self.data[key] = value
+            self.pending_keys.add(key)
+            self.schedule_save()
+            return value
+
+    def schedule_save(self):
+        with self.lock:
+            self.dirty = True
+            if self.save_timer is None:
+                self.save_timer = threading.Timer(self.save_delay, self._save_later)
+                self.save_timer.daemon = True
+                self.save_timer.start()
+
+    def _save_later(self):
+        try:
+            self.flush()
+        except OSError as e:
+            print(f"Error saving {self.path}: {e}")
+
+    def flush(self):
+        """Writes pending changes now, raises OSError when that fails."""
+        with self.write_lock:
+            with self.lock:
+                if self.save_timer is not None:
+                    self.save_timer.cancel()
+                    self.save_timer = None
+                if not self.dirty:
+                    return
+                text = json.dumps(self.data, indent=4)
+                self.dirty = False
+                pending_keys, self.pending_keys = self.pending_keys, set()
+            try:
+                self._write(text)
+            except OSError:
+                # Try again with the next change
+                with self.lock:
+                    self.dirty = True
+                    self.pending_keys |= pending_keys
+                raise
+
+    def _write(self, text):
+        temp_file = self.path + ".tmp"
+        with open(temp_file, "w") as config_file:
+            config_file.write(text)
+            config_file.flush()
+            os.fsync(config_file.fileno())
+        os.replace(temp_file, self.path)
+
+
+class ConfigWatcher(QObject):
+    """Reloads the store when config.json changes on disk and tells
+    subscribers which keys changed. themes_changed is emitted when a
+    theme is added, removed or edited in the themes folder.
+
+    config.json is replaced on every write, which drops it from the
+    underlying watch, so it is added back after each event."""
+
+    config_changed = pyqtSignal(object)
+    themes_changed = pyqtSignal()
+
+    def __init__(self, config_store, themes_folder="themes", parent=None):
+        super().__init__(parent)
+        self.store = config_store
+        self.themes_folder = themes_folder
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+        self.watcher.directoryChanged.connect(self.on_themes_changed)
+
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.timeout.connect(self.reload_config)
+        self.themes_timer = QTimer(self)
+        self.themes_timer.setSingleShot(True)
+        self.themes_timer.timeout.connect(self.emit_themes_changed)
+
+        # Emitted from whichever thread reloads, queued to the GUI thread
+        self.store.subscribe(self.config_changed.emit)
+        self.watch_paths()
+
+    def watch_paths(self):
+        paths = [self.store.path, self.themes_folder]
+        if os.path.isdir(self.themes_folder):
+            paths += [os.path.join(self.themes_folder, name) for name in os.listdir(self.themes_folder)
+                      if name.endswith(".json")]
+        watched = set(self.watcher.files()) | set(self.watcher.directories())
+        missing = [path for path in paths if path not in watched and os.path.exists(path)]
+        if missing:
+            self.watcher.addPaths(missing)
+
+    def on_file_changed(self, path):
+        if path == self.store.path:
+            self.reload_timer.start(RELOAD_DELAY_MS)
+        else:
+            self.themes_timer.start(RELOAD_DELAY_MS)
+
+    def on_themes_changed(self, path):
+        self.themes_timer.start(RELOAD_DELAY_MS)
+
+    def reload_config(self):
+        self.watch_paths()
+        self.store.reload()
+
+    def emit_themes_changed(self):
+        self.watch_paths()
+        self.themes_changed.emit()
+
+
+store = ConfigStore()
+
+# Timers are daemon threads, whatever is pending goes out on exit
+atexit.register(store._save_later)
@@ -0,0 +1,158 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Per-directory totals, next to config.json
+CACHE_FILE = "dir_sizes.json"
+
+# Threads sizing the top-level subdirectories of a folder
+SIZE_WORKERS = 4
+
+# Bumped when the layout of the cache changes, older ones are ignored
+CACHE_FORMAT = 2
+
+_cache_lock = threading.Lock()
+
+
+def load_cache(cache_file=CACHE_FILE):
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("format") != CACHE_FORMAT:
+        return {}
+    return cache.get("dirs", {})
+
+
+def save_cache(dirs, cache_file=CACHE_FILE):
+    temp_file = cache_file + ".tmp"
+    try:
+        with open(temp_file, "w") as f:
+            json.dump({"format": CACHE_FORMAT, "dirs": dirs}, f)
+        os.replace(temp_file, cache_file)
+    except OSError as e:
+        print(f"Error saving folder sizes: {e}")
+
+
+class FolderSizer:
+    """Size of a folder tree from one scandir per directory.
+
+    The bytes and names of the files directly inside a directory are
+    cached with the directory's mtime, which changes when entries are
+    added, removed or renamed. A directory whose mtime still matches is
+    not listed again, a repeat scan is one stat per directory.
+
+    A file that grows in place, like a world's region files, doesn't touch
+    that mtime. restat=True stats the cached files of those directories
+    too, once per sizer, so their sizes are current without listing."""
+
+    def __init__(self, cache_file=CACHE_FILE, workers=SIZE_WORKERS, restat=False):
+        self.cache_file = cache_file
+        self.workers = workers
+        self.restat = restat
+        self.lock = threading.Lock()
+        self.dirs = {}
+        self.seen = set()
+        # Directories whose file sizes are current, kept across calls
+        self.fresh = set()
+        self.changed = False
+
+    def folder_size(self, path):
+        return sum(self.folder_sizes(path).values())
+
+    def folder_sizes(self, path):
+        """{name: bytes} of the top-level entries of path, "." holds the
+        files directly inside it."""
+        path = os.path.abspath(path)
+        with _cache_lock:
+            self.dirs = load_cache(self.cache_file)
+        self.seen = set()
+        self.changed = False
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return {}
+        own, subdirs = self.scan(path, stat.st_mtime_ns)
+        sizes = {".": own}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            totals = executor.map(lambda name: self.tree_size(os.path.join(path, name)), subdirs)
+            sizes.update(zip(subdirs, totals))
+
+        # Folders deleted since the last scan
+        prefix = path + os.sep
+        stale = [key for key in self.dirs if (key == path or key.startswith(prefix)) and key not in self.seen]
+        for key in stale:
+            del self.dirs[key]
+        if self.changed or stale:
+            with _cache_lock:
+                cache = load_cache(self.cache_file)
+                cache = {key: value for key, value in cache.items() if key != path and not key.startswith(prefix)}
+                cache.update({key: value for key, value in self.dirs.items() if key == path or key.startswith(prefix)})
+                save_cache(cache, self.cache_file)
+        return sizes
+
+    def tree_size(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return 0
+        own, subdirs = self.scan(path, stat.st_mtime_ns)
+        return own + sum(self.tree_size(os.path.join(path, name)) for name in subdirs)
+
+    def scan(self, path, mtime_ns):
+        # (bytes of the files in path, names of its subdirectories)
+        with self.lock:
+            self.seen.add(path)
+            cached = self.dirs.get(path)
+            stale = self.restat and path not in self.fresh
+            self.fresh.add(path)
+        if cached and cached[0] == mtime_ns:
+            if stale:
+                own = self.stat_files(path, cached[3])
+                if own != cached[1]:
+                    with self.lock:
+                        self.dirs[path] = [mtime_ns, own, cached[2], cached[3]]
+                        self.changed = True
+                return own, cached[2]
+            return cached[1], cached[2]
+
+        own = 0
+        subdirs = []
+        files = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        elif entry.is_file(follow_symlinks=False):
+                            own += entry.stat(follow_symlinks=False).st_size
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return 0, []
+        with self.lock:
+            self.dirs[path] = [mtime_ns, own, subdirs, files]
+            self.changed = True
+        return own, subdirs
+
+    def stat_files(self, path, files):
+        own = 0
+        for name in files:
+            try:
+                own += os.stat(os.path.join(path, name), follow_symlinks=False).st_size
+            except OSError:
+                continue
+        return own
+
+
+def folder_size(path, cache_file=CACHE_FILE, restat=False):
+    return FolderSizer(cache_file, restat=restat).folder_size(path)
+
+
+def folder_sizes(path, cache_file=CACHE_FILE, restat=False):
+    return FolderSizer(cache_file, restat=restat).folder_sizes(path)
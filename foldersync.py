@@ -0,0 +1,230 @@
+import os
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Threads copying files at the same time
+COPY_WORKERS = 8
+
+COPY_CHUNK = 1024 * 1024
+
+# ioctl number of FICLONE on Linux, a copy-on-write clone of a whole file
+FICLONE = 0x40049409
+
+# Content-addressed, a file there is named after its hash and never
+# rewritten, only these are hardlinked. Libraries are not: a --verify
+# repair rewrites them in place and would change both launchers' copy.
+LINKABLE = (os.path.join("assets", "objects") + os.sep,)
+
+TEMP_SUFFIX = ".picodulce-sync"
+
+
+class SyncResult:
+    def __init__(self):
+        self.total_bytes = 0
+        self.done_bytes = 0
+        self.copied = 0
+        self.cloned = 0
+        self.linked = 0
+        self.skipped = 0
+        self.failed = []
+
+    def summary(self):
+        return (f"{self.copied} copied, {self.cloned} cloned, {self.linked} hardlinked, {self.skipped} up to date, "
+                f"{len(self.failed)} failed ({self.done_bytes} of {self.total_bytes} bytes)")
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb", buffering=0) as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def walk_files(root, relative=""):
+    """(relative path, DirEntry) of every file under root, stats come
+    with the directory listing on most systems."""
+    try:
+        entries = list(os.scandir(os.path.join(root, relative)))
+    except OSError as e:
+        print(f"Skipping folder {os.path.join(root, relative)} ({e})")
+        return
+    for entry in entries:
+        path = os.path.join(relative, entry.name)
+        if entry.is_dir(follow_symlinks=False):
+            yield from walk_files(root, path)
+        elif entry.is_file():
+            yield path, entry
+
+
+def needs_copy(src_stat, dst_path, src_path, hash_files):
+    try:
+        dst_stat = os.stat(dst_path)
+    except OSError:
+        return True
+    if src_stat.st_ino == dst_stat.st_ino and src_stat.st_dev == dst_stat.st_dev:
+        return False
+    # copy2 keeps the mtime, whole seconds survive every filesystem
+    if src_stat.st_size == dst_stat.st_size and int(src_stat.st_mtime) == int(dst_stat.st_mtime):
+        return False
+    # Never roll back a file that was changed on the destination since
+    if dst_stat.st_mtime > src_stat.st_mtime:
+        return False
+    if hash_files and src_stat.st_size == dst_stat.st_size:
+        try:
+            return file_sha1(src_path) != file_sha1(dst_path)
+        except OSError:
+            return True
+    return True
+
+
+def plan_sync(src_dir, dst_dir, hash_files=False):
+    """[(relative path, size)] of the files of src_dir missing or older in
+    dst_dir. Files that match in size and mtime are skipped, hash_files
+    also skips files with equal contents."""
+    to_copy = []
+    skipped = 0
+    for relative, entry in walk_files(src_dir):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if needs_copy(stat, os.path.join(dst_dir, relative), entry.path, hash_files):
+            to_copy.append((relative, stat.st_size))
+        else:
+            skipped += 1
+    return to_copy, skipped
+
+
+def same_filesystem(src_dir, dst_dir):
+    try:
+        return os.stat(src_dir).st_dev == os.stat(dst_dir).st_dev
+    except OSError:
+        return False
+
+
+def clone_file(src_path, dst_path):
+    # True when the filesystem made a copy-on-write clone (btrfs, XFS)
+    if fcntl is None or not hasattr(fcntl, "ioctl"):
+        return False
+    cloned = False
+    try:
+        with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            cloned = True
+    except OSError:
+        pass
+    finally:
+        # No empty temporary file left behind, whatever stopped the clone
+        if not cloned:
+            try:
+                os.remove(dst_path)
+            except OSError:
+                pass
+    return cloned
+
+
+def copy_file(src_path, dst_path, progress):
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        for chunk in iter(lambda: src.read(COPY_CHUNK), b""):
+            dst.write(chunk)
+            progress(len(chunk))
+
+
+class FolderSync:
+    """Brings dst_dir up to date with src_dir.
+
+    Only files that are missing or older on the destination are copied,
+    by COPY_WORKERS threads. On the same filesystem a file is cloned when
+    the filesystem supports reflinks and immutable ones are hardlinked
+    otherwise. progress(done bytes, total bytes) is called from the
+    worker threads."""
+
+    def __init__(self, src_dir, dst_dir, hash_files=False, workers=COPY_WORKERS, progress=None):
+        self.src_dir = src_dir
+        self.dst_dir = dst_dir
+        self.hash_files = hash_files
+        self.workers = workers
+        self.progress = progress or (lambda done, total: None)
+        self.result = SyncResult()
+        self.lock = threading.Lock()
+        self.can_clone = True
+        self.same_filesystem = False
+
+    def add_progress(self, size):
+        with self.lock:
+            self.result.done_bytes += size
+            done, total = self.result.done_bytes, self.result.total_bytes
+        self.progress(done, total)
+
+    def run(self):
+        to_copy, self.result.skipped = plan_sync(self.src_dir, self.dst_dir, self.hash_files)
+        self.result.total_bytes = sum(size for _, size in to_copy)
+        if not to_copy:
+            return self.result
+        os.makedirs(self.dst_dir, exist_ok=True)
+        self.same_filesystem = same_filesystem(self.src_dir, self.dst_dir)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(self.sync_file, to_copy))
+        return self.result
+
+    def sync_file(self, item):
+        relative, size = item
+        src_path = os.path.join(self.src_dir, relative)
+        dst_path = os.path.join(self.dst_dir, relative)
+        temp_path = dst_path + TEMP_SUFFIX
+        copied = 0
+
+        def progress(chunk):
+            nonlocal copied
+            copied += chunk
+            self.add_progress(chunk)
+
+        try:
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            kind = self.place_file(relative, src_path, temp_path, progress)
+            if kind != "linked":
+                shutil.copystat(src_path, temp_path)
+            # Readers of dst_path never see half a file
+            os.replace(temp_path, dst_path)
+        except OSError as e:
+            print(f"Skipping file {dst_path} ({e})")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            with self.lock:
+                self.result.failed.append(relative)
+            # The bar still has to reach the end
+            self.add_progress(size - copied)
+            return
+
+        if kind != "copied":
+            self.add_progress(size)
+        with self.lock:
+            setattr(self.result, kind, getattr(self.result, kind) + 1)
+
+    def place_file(self, relative, src_path, temp_path, progress):
+        if self.same_filesystem:
+            if self.can_clone:
+                if clone_file(src_path, temp_path):
+                    return "cloned"
+                # One failed clone means the filesystem can't, stop trying
+                self.can_clone = False
+            if relative.startswith(LINKABLE):
+                try:
+                    if os.path.lexists(temp_path):
+                        os.remove(temp_path)
+                    os.link(src_path, temp_path)
+                    return "linked"
+                except OSError:
+                    pass
+        copy_file(src_path, temp_path, progress)
+        return "copied"
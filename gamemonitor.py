@@ -0,0 +1,329 @@
+import os
+import re
+import time
+from collections import deque, namedtuple
+
+import launchstats
+import jvmprofiles
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QGridLayout, QLabel, QWidget, QPushButton
+from PyQt5.QtGui import QPainter, QPen, QPalette
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+
+# Seconds between two samples of the game process
+SAMPLE_INTERVAL = 2
+
+# Samples kept per session, two hours at the default interval
+MAX_SAMPLES = 3600
+
+# Seconds to wait for zucaro to start java before giving up
+FIND_TIMEOUT = 300
+
+# Session summaries kept in config.json
+MAX_SESSIONS = 50
+
+Sample = namedtuple("Sample", ["time", "rss", "cpu_percent", "threads"])
+
+# [1.234s][info][gc] GC(3) Pause Young (Normal) (G1 Evacuation Pause) 100M->50M(256M) 3.456ms
+GC_PAUSE = re.compile(r"Pause.*?(?:(\d+)([KMG])->(\d+)([KMG])\((\d+)[KMG]\))?\s+(\d+(?:\.\d+)?)ms\s*$")
+
+UNIT_MB = {"K": 1 / 1024, "M": 1, "G": 1024}
+
+try:
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = 100
+    PAGE_SIZE = 4096
+
+
+def available():
+    # Everything is read from /proc, Linux only
+    return os.path.isdir("/proc/self")
+
+
+def read_stat(pid):
+    """(cpu ticks, threads, parent pid, command name) of a process."""
+    with open(f"/proc/{pid}/stat", "rb") as f:
+        data = f.read().decode(errors="replace")
+    # The command name is in parentheses and may contain spaces
+    name = data[data.index("(") + 1:data.rindex(")")]
+    fields = data[data.rindex(")") + 2:].split()
+    if fields[0] == "Z":
+        # Exited, waiting to be reaped
+        raise ProcessLookupError(pid)
+    return int(fields[11]) + int(fields[12]), int(fields[17]), int(fields[1]), name
+
+
+def read_rss(pid):
+    with open(f"/proc/{pid}/statm", "r") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def find_java_pid(root_pid, exclude=()):
+    """The first java process in the process tree under root_pid."""
+    children = {}
+    names = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            _, _, parent, name = read_stat(entry)
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+        names[int(entry)] = name
+    queue = deque([root_pid])
+    while queue:
+        pid = queue.popleft()
+        if pid not in exclude and names.get(pid, "").startswith("java"):
+            return pid
+        queue.extend(children.get(pid, []))
+    return None
+
+
+def gc_log_args(path, java_version):
+    # Unified logging came with Java 9, older ones refuse the option
+    if not path or jvmprofiles.java_major(java_version or "") < 9:
+        return []
+    return [f'-Xlog:gc:file="{path}":uptime:filecount=1,filesize=10m']
+
+
+class GcLogTail:
+    """Reads the pauses the JVM appended to its GC log since the last call."""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.partial = ""
+
+    def read_pauses(self):
+        """[(pause ms, heap after GC in MB or None)]"""
+        try:
+            with open(self.path, "r", errors="replace") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < self.offset:
+                    # Rotated
+                    self.offset = 0
+                f.seek(self.offset)
+                data = f.read()
+                self.offset = f.tell()
+        except OSError:
+            return []
+        *lines, self.partial = (self.partial + data).split("\n")
+        pauses = []
+        for line in lines:
+            match = GC_PAUSE.search(line)
+            if match:
+                after = None
+                if match.group(3):
+                    after = int(match.group(3)) * UNIT_MB[match.group(4)]
+                pauses.append((float(match.group(6)), after))
+        return pauses
+
+
+class GameMonitor(QObject):
+    """Samples RSS, CPU and threads of the game's JVM from /proc.
+
+    root_pid is the process the launch started, java itself when direct.
+    Otherwise it is the zucaro child or the launcher when zucaro runs in a
+    thread, and the JVM is looked up below it until it shows up. Monitors
+    keep themselves alive until the game exits and finished carries the
+    session summary."""
+
+    sampled = pyqtSignal(object)
+    finished = pyqtSignal(object)
+
+    running = set()
+
+    def __init__(self, root_pid, direct=False, gc_log=None, interval=SAMPLE_INTERVAL):
+        super().__init__()
+        self.root_pid = root_pid
+        self.pid = root_pid if direct else None
+        self.gc_tail = GcLogTail(gc_log) if gc_log else None
+        self.samples = deque(maxlen=MAX_SAMPLES)
+        self.pauses = []
+        self.peak_heap_after_gc = None
+        self.started = time.time()
+        self.last_cpu = None
+        self.done = False
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.sample)
+        self.interval = interval
+
+    def start(self):
+        GameMonitor.running.add(self)
+        self.timer.start(int(self.interval * 1000))
+        self.sample()
+
+    def sample(self):
+        if self.pid is None:
+            # A game still running from an earlier launch is a child too
+            self.pid = find_java_pid(self.root_pid, {monitor.pid for monitor in GameMonitor.running})
+            if self.pid is None:
+                if time.time() - self.started > FIND_TIMEOUT or not os.path.exists(f"/proc/{self.root_pid}"):
+                    self.stop()
+                return
+        try:
+            ticks, threads, _, _ = read_stat(self.pid)
+            rss = read_rss(self.pid)
+        except (OSError, ValueError, IndexError):
+            # The game exited
+            self.stop()
+            return
+
+        now = time.monotonic()
+        cpu_percent = 0.0
+        if self.last_cpu is not None:
+            last_ticks, last_time = self.last_cpu
+            if now > last_time:
+                cpu_percent = (ticks - last_ticks) / CLOCK_TICKS / (now - last_time) * 100
+        self.last_cpu = (ticks, now)
+
+        if self.gc_tail is not None:
+            for pause, after in self.gc_tail.read_pauses():
+                self.pauses.append(pause)
+                if after is not None:
+                    self.peak_heap_after_gc = max(self.peak_heap_after_gc or 0, after)
+
+        sample = Sample(time.time(), rss, round(cpu_percent, 1), threads)
+        self.samples.append(sample)
+        self.sampled.emit(sample)
+
+    def stop(self):
+        if self.done:
+            return
+        self.done = True
+        self.timer.stop()
+        GameMonitor.running.discard(self)
+        self.finished.emit(self.summary())
+
+    def summary(self):
+        summary = {"started": self.started, "duration_s": round(time.time() - self.started), "pid": self.pid}
+        samples = list(self.samples)
+        if samples:
+            rss = [sample.rss for sample in samples]
+            # The first CPU sample has nothing to compare with
+            cpu = [sample.cpu_percent for sample in samples[1:]] or [0.0]
+            summary.update(
+                samples=len(samples),
+                peak_rss_mb=round(max(rss) / 1048576),
+                avg_rss_mb=round(sum(rss) / len(rss) / 1048576),
+                avg_cpu_percent=round(sum(cpu) / len(cpu), 1),
+                max_threads=max(sample.threads for sample in samples),
+            )
+        if self.pauses:
+            summary.update(
+                gc_pauses=len(self.pauses),
+                gc_pause_total_ms=round(sum(self.pauses), 1),
+                gc_pause_max_ms=round(max(self.pauses), 1),
+                gc_pause_p95_ms=round(launchstats.percentile(self.pauses, 0.95), 1),
+            )
+        if self.peak_heap_after_gc is not None:
+            summary["peak_heap_after_gc_mb"] = round(self.peak_heap_after_gc)
+        return summary
+
+
+def latest_monitor():
+    monitors = sorted(GameMonitor.running, key=lambda monitor: monitor.started)
+    return monitors[-1] if monitors else None
+
+
+def format_summary(summary):
+    minutes = summary.get("duration_s", 0) / 60
+    text = f"{summary.get('version', 'game')}: {minutes:.0f} min"
+    if "peak_rss_mb" in summary:
+        text += f", RSS peak {summary['peak_rss_mb']} MB avg {summary['avg_rss_mb']} MB" \
+                f", CPU avg {summary['avg_cpu_percent']}%, {summary['max_threads']} threads"
+    if "gc_pauses" in summary:
+        text += f", {summary['gc_pauses']} GC pauses (p95 {summary['gc_pause_p95_ms']} ms," \
+                f" max {summary['gc_pause_max_ms']} ms)"
+    if "peak_heap_after_gc_mb" in summary:
+        text += f", live heap peak {summary['peak_heap_after_gc_mb']} MB"
+    return text
+
+
+class RssGraph(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.values = []
+        self.setMinimumHeight(80)
+
+    def set_values(self, values):
+        self.values = values[-self.width():] if self.width() > 0 else values
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(self.palette().color(QPalette.Mid)))
+        painter.drawRect(0, 0, self.width() - 1, self.height() - 1)
+        if len(self.values) < 2:
+            return
+        top = max(self.values) or 1
+        step = (self.width() - 2) / (len(self.values) - 1)
+        points = [(1 + index * step, self.height() - 2 - value / top * (self.height() - 4))
+                  for index, value in enumerate(self.values)]
+        painter.setPen(QPen(self.palette().color(QPalette.Highlight), 2))
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            painter.drawLine(int(x1), int(y1), int(x2), int(y2))
+
+
+class MonitorWindow(QDialog):
+    def __init__(self, monitor, parent=None):
+        super().__init__(parent)
+        self.monitor = monitor
+        self.setWindowTitle("Game Monitor")
+        self.resize(420, 260)
+
+        layout = QVBoxLayout()
+        grid = QGridLayout()
+        self.values = {}
+        for row, (key, title) in enumerate((("rss", "Memory (RSS)"), ("cpu", "CPU"), ("threads", "Threads"),
+                                            ("gc", "GC pauses"), ("heap", "Live heap after GC"))):
+            grid.addWidget(QLabel(title + ":"), row, 0)
+            self.values[key] = QLabel("-")
+            grid.addWidget(self.values[key], row, 1)
+        layout.addLayout(grid)
+
+        self.graph = RssGraph()
+        layout.addWidget(self.graph)
+
+        self.status_label = QLabel("Waiting for the game...")
+        self.status_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.status_label)
+
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+        self.setLayout(layout)
+
+        monitor.sampled.connect(self.on_sample)
+        monitor.finished.connect(self.on_finished)
+        self.finished.connect(self.detach)
+        if monitor.samples:
+            self.on_sample(monitor.samples[-1])
+
+    def on_sample(self, sample):
+        monitor = self.monitor
+        self.values["rss"].setText(f"{sample.rss / 1048576:.0f} MB")
+        self.values["cpu"].setText(f"{sample.cpu_percent:.0f}%")
+        self.values["threads"].setText(str(sample.threads))
+        if monitor.pauses:
+            self.values["gc"].setText(f"{len(monitor.pauses)}, last {monitor.pauses[-1]:.1f} ms, "
+                                      f"max {max(monitor.pauses):.1f} ms")
+        elif monitor.gc_tail is None:
+            self.values["gc"].setText("not logged for this launch")
+        if monitor.peak_heap_after_gc is not None:
+            self.values["heap"].setText(f"peak {monitor.peak_heap_after_gc:.0f} MB")
+        self.graph.set_values([s.rss for s in monitor.samples])
+        self.status_label.setText(f"Java PID {monitor.pid}")
+
+    def on_finished(self, summary):
+        self.status_label.setText("The game exited.")
+
+    def detach(self):
+        for signal_, slot in ((self.monitor.sampled, self.on_sample), (self.monitor.finished, self.on_finished)):
+            try:
+                signal_.disconnect(slot)
+            except TypeError:
+                pass
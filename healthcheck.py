@@ -2,67 +2,55 @@ import os
 import json
 import shutil
 import modulecli
+import configstore
+import foldersync
 from PyQt5.QtWidgets import QApplication, QDialog, QVBoxLayout, QLabel, QProgressBar
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 import sys
 
 class CopyThread(QThread):
     progress_changed = pyqtSignal(int)
+    status_changed = pyqtSignal(str)
     finished = pyqtSignal()
 
     def __init__(self, src_dir, dst_dir):
         super().__init__()
         self.src_dir = src_dir
         self.dst_dir = dst_dir
+        self.percent = -1
+        self.result = None
 
     def run(self):
-        # Gather all files recursively
-        files_to_copy = []
-        for root, dirs, files in os.walk(self.src_dir):
-            for f in files:
-                full_path = os.path.join(root, f)
-                relative_path = os.path.relpath(full_path, self.src_dir)
-                files_to_copy.append(relative_path)
-
-        total_files = len(files_to_copy)
-        copied_files = 0
-
-        for relative_path in files_to_copy:
-            src_path = os.path.join(self.src_dir, relative_path)
-            dst_path = os.path.join(self.dst_dir, relative_path)
-            dst_folder = os.path.dirname(dst_path)
-
-            if not os.path.exists(dst_folder):
-                try:
-                    os.makedirs(dst_folder)
-                except PermissionError:
-                    print(f"Skipping folder {dst_folder} (permission denied)")
-                    continue
-
-            try:
-                shutil.copy2(src_path, dst_path)
-            except PermissionError:
-                print(f"Skipping file {dst_path} (permission denied)")
-
-            copied_files += 1
-            progress_percent = int((copied_files / total_files) * 100)
-            self.progress_changed.emit(progress_percent)
-
+        # Only files missing or older in zucaro are copied, see foldersync.py
+        self.status_changed.emit("Comparing files...")
+        sync = foldersync.FolderSync(self.src_dir, self.dst_dir, progress=self.on_progress)
+        self.result = sync.run()
+        print(f"Migration: {self.result.summary()}")
         self.finished.emit()
 
+    def on_progress(self, done, total):
+        # Called for every chunk, the bar only needs whole percents
+        percent = int(done * 100 / total) if total else 100
+        if percent != self.percent:
+            self.percent = percent
+            self.progress_changed.emit(percent)
+            self.status_changed.emit(f"Copying {done // 1048576} of {total // 1048576} MB...")
+
 
 class HealthCheck:
     def __init__(self):
         self.config = None
 
     def check_config_file(self):
-        config_path = "config.json"
+        store = configstore.store
+        config_path = store.path
         default_config = {
             "IsRCPenabled": False,
             "CheckUpdate": False,
             "IsBleeding": False,
             "LastPlayed": "",
             "TotalPlaytime": 0,
+            "PlaySessions": [],
             "IsFirstLaunch": True,
             "Instance": "default",
             "Theme": "Dark.json",
@@ -73,6 +61,15 @@ class HealthCheck:
             "MaxRAM": "2G",
             "JavaPath": "",
             "ZucaroCheck": False,
+            "LaunchInSubprocess": True,
+            "MaxParallelPrepares": 3,
+            "ZucaroWorkers": 0,
+            "ZucaroTraceFile": "",
+            "SpeculativePrepare": True,
+            "CacheLaunchPlans": True,
+            "JvmProfile": "default",
+            "ClassDataSharing": True,
+            "MonitorGame": True,
             "KeyboardShortcuts": {
                 "Screenshots": "Ctrl+A",
                 "Play": "Ctrl+P",
@@ -94,14 +91,13 @@ class HealthCheck:
 
         if not os.path.exists(config_path):
             print("Config file not found. Creating default.")
-            with open(config_path, "w") as config_file:
-                json.dump(default_config, config_file, indent=4)
-            self.config = default_config
+            store.replace(default_config)
+            store.flush()
+            self.config = store
             return
 
         try:
-            with open(config_path, "r") as config_file:
-                self.config = json.load(config_file)
+            store.load()
         except (json.JSONDecodeError, ValueError) as e:
             print(f"Error loading config.json: {e}")
             backup_path = "config.json.bak"
@@ -123,14 +119,16 @@ class HealthCheck:
                 pass
 
             print("Resetting to default config due to corruption.")
-            self.config = default_config.copy()
+            config = default_config.copy()
             if extracted_playtime > 0:
-                self.config["TotalPlaytime"] = extracted_playtime
+                config["TotalPlaytime"] = extracted_playtime
             
-            with open(config_path, "w") as config_file:
-                json.dump(self.config, config_file, indent=4)
+            store.replace(config)
+            store.flush()
+            self.config = store
             return
 
+        self.config = store
         updated = False
         
         # Migrate old singular ThemeRepository to list
@@ -146,25 +144,13 @@ class HealthCheck:
                 updated = True
 
         if updated:
-            with open(config_path, "w") as config_file:
-                json.dump(self.config, config_file, indent=4)
-
-
-    def get_folder_size(self, folder_path):
-        total_size = 0
-        for dirpath, dirnames, filenames in os.walk(folder_path):
-            for f in filenames:
-                fp = os.path.join(dirpath, f)
-                if os.path.isfile(fp):
-                    total_size += os.path.getsize(fp)
-        return total_size
+            store.flush()
 
     def zucaro_health_check(self):
         if self.config.get("ZucaroCheck"):
             return
 
-        output = modulecli.run_command("instance dir").strip()
-        instance_dir = os.path.abspath(output)
+        instance_dir = os.path.abspath(modulecli.instance_dir())
         base_dir = os.path.abspath(os.path.join(instance_dir, "..", ".."))
 
         possible_zucaro = [os.path.join(base_dir, "zucaro"), os.path.join(base_dir, ".zucaro")]
@@ -177,22 +163,9 @@ class HealthCheck:
             print("Required directories not found. Skipping copy.")
             # Mark the check as done so it wont run again
             self.config["ZucaroCheck"] = True
-            with open("config.json", "w") as f:
-                json.dump(self.config, f, indent=4)
-            return
-
-        picomc_size = self.get_folder_size(picomc_dir)
-        zucaro_size = self.get_folder_size(zucaro_dir)
-
-        if picomc_size <= zucaro_size:
-            print("No action needed. Zucaro folder is not smaller than Picomc.")
-            # Update config so the check is considered done
-            self.config["ZucaroCheck"] = True
-            with open("config.json", "w") as f:
-                json.dump(self.config, f, indent=4)
             return
 
-        print(f"Copying Picomc ({picomc_size} bytes) to Zucaro ({zucaro_size} bytes)...")
+        print(f"Syncing Picomc ({picomc_dir}) to Zucaro ({zucaro_dir})...")
 
         QApplication.instance() or QApplication(sys.argv)
         dialog = QDialog()
@@ -209,6 +182,7 @@ class HealthCheck:
         # Setup copy thread
         thread = CopyThread(picomc_dir, zucaro_dir)
         thread.progress_changed.connect(progress.setValue)
+        thread.status_changed.connect(label.setText)
         thread.finished.connect(dialog.accept)
         thread.start()
 
@@ -216,8 +190,6 @@ class HealthCheck:
 
         # Mark as done
         self.config["ZucaroCheck"] = True
-        with open("config.json", "w") as f:
-            json.dump(self.config, f, indent=4)
 
         print("Copy completed.")
 
@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import modulecli
+
+# Kept in the version folder, next to <version>.json
+MANIFEST_NAME = "picodulce-integrity.json"
+
+# Bumped when the layout of the manifest changes, older ones are ignored
+MANIFEST_FORMAT = 1
+
+# Threads hashing files that changed since the last check
+HASH_WORKERS = 4
+
+HASH_CHUNK = 1024 * 1024
+
+_manifest_lock = threading.Lock()
+
+
+class IntegrityResult:
+    def __init__(self, version):
+        self.version = version
+        self.checked = 0
+        self.hashed = 0
+        # Absent files, zucaro downloads these on a normal launch
+        self.missing = []
+        # Files on disk with the wrong size or hash, only --verify replaces them
+        self.mismatched = []
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return not self.missing and not self.mismatched
+
+    def summary(self):
+        if self.ok:
+            state = "ok"
+        else:
+            state = ", ".join(filter(None, [self.missing and f"{len(self.missing)} missing",
+                                            self.mismatched and f"{len(self.mismatched)} corrupt"]))
+        return (f"{self.version}: {self.checked} files checked, {self.hashed} hashed, "
+                f"{state} ({self.seconds:.2f}s)")
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb", buffering=0) as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_path(launcher, version):
+    from zucaro.utils import Directory
+    return os.path.join(str(launcher.get_path(Directory.VERSIONS)), version, MANIFEST_NAME)
+
+
+def load_manifest(path):
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return {}
+    return manifest.get("files", {})
+
+
+def save_manifest(path, files):
+    temp_file = path + ".tmp"
+    try:
+        with open(temp_file, "w") as f:
+            json.dump({"format": MANIFEST_FORMAT, "updated": time.time(), "files": files}, f)
+        os.replace(temp_file, path)
+    except OSError as e:
+        print(f"Error saving integrity manifest {path}: {e}")
+
+
+def expected_files(launcher, vobj):
+    """{path: (sha1, size, kind)} of the jar, libraries and assets of a
+    version object.
+
+    sha1 and size are None when the version JSON doesn't list them, those
+    files are only checked for existence."""
+    from zucaro.utils import Directory
+    files = {}
+
+    libraries_root = launcher.get_path(Directory.LIBRARIES)
+    # Without java info the rules are matched on the OS alone, the same
+    # libraries zucaro picks on this machine
+    for library in vobj.get_libraries(None):
+        if library.available:
+            files[str(library.get_abspath(libraries_root))] = (library.sha1, library.size, "library")
+
+    client = vobj.vspec.downloads.get("client") or {}
+    files[str(vobj.jarfile)] = (client.get("sha1"), client.get("size"), "jar")
+
+    if hasattr(vobj, "raw_asset_index"):
+        objects_root = launcher.get_path(Directory.ASSET_OBJECTS)
+        for obj in vobj.raw_asset_index["objects"].values():
+            sha = obj["hash"]
+            files[str(objects_root / sha[0:2] / sha)] = (sha, obj.get("size"), "asset")
+    return files
+
+
+def check_version(version, full=False, cancelled=None, prefetch=False):
+    """Checks the files of a version against its integrity manifest.
+
+    A file whose size and mtime match the manifest entry is trusted without
+    reading it, only new or changed files are hashed. full=True hashes
+    every file again. Good files are written back to the manifest so the
+    next check of the same version is stat calls only.
+
+    cancelled is polled between files, InterruptedError is raised once it
+    returns True. prefetch=True asks the OS to read the jar and libraries
+    into its cache for the launch that follows."""
+    cancelled = cancelled or (lambda: False)
+    started = time.monotonic()
+    result = IntegrityResult(version)
+
+    # Resolving the version may download its JSON and asset index, other
+    # queries shouldn't wait on the engine lock meanwhile
+    launcher = modulecli.engine.get_launcher()
+    vobj = launcher.version_manager.get_version(version)
+    with modulecli.engine.session() as launcher:
+        expected = expected_files(launcher, vobj)
+        path = manifest_path(launcher, version)
+
+    with _manifest_lock:
+        known = {} if full else load_manifest(path)
+
+    manifest = {}
+    to_hash = []
+    for file_path, (sha1, size, _) in expected.items():
+        if cancelled():
+            raise InterruptedError(f"Check of {version} cancelled")
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            result.missing.append(file_path)
+            continue
+        # Same quirk zucaro checks for, fabric leaves an empty client jar
+        if stat.st_size == 0 or (size is not None and stat.st_size != size):
+            result.mismatched.append(file_path)
+            continue
+        entry = known.get(file_path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns and (sha1 is None or entry[2] == sha1):
+            manifest[file_path] = entry
+        else:
+            to_hash.append((file_path, sha1, stat))
+
+    if to_hash:
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS) as executor:
+            hashes = executor.map(lambda item: None if cancelled() else _hash_or_none(item[0]), to_hash)
+            for (file_path, sha1, stat), digest in zip(to_hash, hashes):
+                if cancelled():
+                    continue
+                if digest is None or (sha1 is not None and digest != sha1):
+                    result.mismatched.append(file_path)
+                else:
+                    manifest[file_path] = [stat.st_size, stat.st_mtime_ns, digest]
+        result.hashed = len(to_hash)
+        if cancelled():
+            # Keep what was hashed, the next check starts from there
+            with _manifest_lock:
+                save_manifest(path, manifest)
+            raise InterruptedError(f"Check of {version} cancelled")
+
+    result.checked = len(expected)
+    # Nothing changed, skip rewriting a manifest of thousands of entries
+    if result.hashed or len(manifest) != len(known):
+        with _manifest_lock:
+            save_manifest(path, manifest)
+    if prefetch:
+        prefetch_files(file_path for file_path, (_, _, kind) in expected.items() if kind != "asset")
+    result.seconds = time.monotonic() - started
+    return result
+
+
+def prefetch_files(paths):
+    # A hint only, the kernel reads the files in the background
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def _hash_or_none(path):
+    try:
+        return file_sha1(path)
+    except OSError:
+        return None
+
+
+def forget_version(version):
+    # The next check hashes everything again
+    with modulecli.engine.session() as launcher:
+        path = manifest_path(launcher, version)
+    with _manifest_lock:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,220 @@
+import os
+import re
+import shlex
+import shutil
+import threading
+import subprocess
+
+import modulecli
+
+# Added to the JVM arguments of a profile, tells picodulce's arguments
+# apart from ones set by hand through zucaro
+PROFILE_MARKER = "-Dpicodulce.profile="
+
+# Above this heap G1 uses bigger regions
+LARGE_HEAP_MB = 12 * 1024
+
+# Aikar's flags, tuned for short G1 pauses on Minecraft servers and clients
+G1_ARGS = (
+    "-XX:+UseG1GC -XX:+ParallelRefProcEnabled -XX:MaxGCPauseMillis=200 "
+    "-XX:+UnlockExperimentalVMOptions -XX:+DisableExplicitGC -XX:+AlwaysPreTouch "
+    "-XX:G1NewSizePercent=30 -XX:G1MaxNewSizePercent=40 -XX:G1ReservePercent=20 "
+    "-XX:G1HeapWastePercent=5 -XX:G1MixedGCCountTarget=4 -XX:InitiatingHeapOccupancyPercent=15 "
+    "-XX:G1MixedGCLiveThresholdPercent=90 -XX:G1RSetUpdatingPauseTimePercent=5 "
+    "-XX:SurvivorRatio=32 -XX:+PerfDisableSharedMem -XX:MaxTenuringThreshold=1"
+)
+
+# name -> (label, minimum java, description)
+PROFILES = {
+    "default": ("zucaro default", 8, "The JVM arguments zucaro uses, -Xms and -Xmx both set to the allocated RAM."),
+    "g1": ("G1 (tuned)", 8, "G1 with tuned region sizes and pause targets. A good default for most instances."),
+    "zgc": ("ZGC", 15, "Sub-millisecond pauses on large heaps. Uses more memory than G1."),
+    "zgc-generational": ("Generational ZGC", 21, "ZGC with a young generation, better throughput for large modpacks."),
+    "shenandoah": ("Shenandoah", 12, "Low pauses on medium to large heaps. Not included in Oracle's builds of Java."),
+    "low-memory": ("Low memory", 8, "Serial GC with a small initial heap, for machines with little RAM."),
+}
+
+DEFAULT_PROFILE = "default"
+
+# Profiles whose arguments depend on the Java they run on
+JAVA_DEPENDENT = ("zgc-generational", "shenandoah")
+
+# Shenandoah was experimental before this
+SHENANDOAH_PRODUCT_JAVA = 15
+
+# Heaps below this get a warning for the ZGC profiles
+ZGC_MIN_HEAP_MB = 4 * 1024
+
+# (java path, mtime of the executable) -> detect_java result
+_detected = {}
+_detected_lock = threading.Lock()
+
+
+def parse_ram_mb(ram):
+    # "4G", "4096M" or a bare number of gigabytes like MaxRAM used to be
+    match = re.match(r"^\s*(\d+)\s*([KMGT]?)B?\s*$", str(ram).upper())
+    if not match:
+        return 2048
+    value, unit = int(match.group(1)), match.group(2) or "G"
+    return {"K": value // 1024, "M": value, "G": value * 1024, "T": value * 1024 * 1024}[unit]
+
+
+def format_mb(mb):
+    return f"{mb // 1024}G" if mb % 1024 == 0 else f"{mb}M"
+
+
+def heap_args(profile, ram):
+    """-Xms/-Xmx of a profile for the allocated RAM."""
+    max_mb = parse_ram_mb(ram)
+    if profile == "low-memory":
+        min_mb = min(256, max_mb)
+    elif profile == "shenandoah":
+        min_mb = max(256, max_mb // 2)
+    else:
+        # G1 and ZGC like a heap that doesn't resize under load
+        min_mb = max_mb
+    return [f"-Xms{format_mb(min_mb)}", f"-Xmx{format_mb(max_mb)}"]
+
+
+def profile_args(profile, ram, java_major=None):
+    """JVM arguments of a profile, None for zucaro's own."""
+    if profile not in PROFILES or profile == DEFAULT_PROFILE:
+        return None
+    max_mb = parse_ram_mb(ram)
+    if profile == "g1":
+        region = "16M" if max_mb > LARGE_HEAP_MB else "8M"
+        gc_args = G1_ARGS + f" -XX:G1HeapRegionSize={region}"
+    elif profile == "zgc":
+        gc_args = "-XX:+UseZGC -XX:+AlwaysPreTouch"
+    elif profile == "zgc-generational":
+        # Generational is the only mode left from Java 23 on
+        gc_args = "-XX:+UseZGC -XX:+AlwaysPreTouch"
+        if java_major is None or java_major < 23:
+            gc_args += " -XX:+ZGenerational"
+    elif profile == "shenandoah":
+        gc_args = "-XX:+UseShenandoahGC -XX:+AlwaysPreTouch"
+        # Java 12 to 14 refuse to start without the unlock, later ones accept it
+        if java_major is None or java_major < SHENANDOAH_PRODUCT_JAVA:
+            gc_args = "-XX:+UnlockExperimentalVMOptions " + gc_args
+    else:
+        gc_args = "-XX:+UseSerialGC -XX:MinHeapFreeRatio=10 -XX:MaxHeapFreeRatio=30 -XX:ReservedCodeCacheSize=64m"
+    # zucaro puts its own -Xms/-Xmx first, for the JVM the last one wins
+    return " ".join([PROFILE_MARKER + profile] + heap_args(profile, ram) + shlex.split(gc_args))
+
+
+def detect_java(java="java"):
+    """(major version, vendor) of a java executable, None if it can't run.
+
+    Runs java once per executable, an updated java is run again. Blocks
+    for up to 15 seconds, not for the GUI thread."""
+    executable = shutil.which(java or "java") or java or "java"
+    try:
+        key = (executable, os.stat(executable).st_mtime_ns)
+    except OSError:
+        key = None
+    with _detected_lock:
+        if key in _detected:
+            return _detected[key]
+    detected = _run_java_version(java)
+    # A java that couldn't run is tried again next time
+    if key is not None and detected is not None:
+        with _detected_lock:
+            _detected[key] = detected
+    return detected
+
+
+def _run_java_version(java):
+    try:
+        result = subprocess.run([java or "java", "-XshowSettings:properties", "-version"],
+                                capture_output=True, text=True, timeout=15)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    properties = dict(re.findall(r"^\s*([\w.]+) = (.*)$", result.stderr, re.MULTILINE))
+    version = properties.get("java.version")
+    if version is None:
+        match = re.search(r'version "([^"]+)"', result.stderr)
+        if not match:
+            return None
+        version = match.group(1)
+    return java_major(version), properties.get("java.vm.vendor", properties.get("java.vendor", ""))
+
+
+def java_major(version):
+    # 1.8.0_292 -> 8, 17.0.1 -> 17, 21 -> 21
+    parts = re.findall(r"\d+", version)
+    if not parts:
+        return 0
+    if parts[0] == "1" and len(parts) > 1:
+        return int(parts[1])
+    return int(parts[0])
+
+
+def validate_profile(profile, java_path="", manage_java=False, ram="2G"):
+    """(error, warning) for a profile with the java that launches the game.
+
+    error means the JVM won't start with it, warning is only worth a note.
+    May run java, see detect_java."""
+    if profile not in PROFILES:
+        return f"Unknown JVM profile: {profile}", None
+    label, minimum, _ = PROFILES[profile]
+    warning = None
+    if profile.startswith("zgc") and parse_ram_mb(ram) < ZGC_MIN_HEAP_MB:
+        warning = f"{label} is meant for heaps of {format_mb(ZGC_MIN_HEAP_MB)} and more."
+    if minimum <= 8:
+        return None, warning
+    if manage_java:
+        # The managed java depends on the Minecraft version being launched
+        note = f"{label} needs Java {minimum} or newer, older Minecraft versions run on an older managed Java."
+        return None, " ".join(filter(None, [warning, note]))
+
+    detected = detect_java(java_path or "java")
+    if detected is None:
+        return f"Could not run Java at '{java_path or 'java'}' to check the {label} profile.", warning
+    major, vendor = detected
+    if major < minimum:
+        return f"{label} needs Java {minimum} or newer, the selected Java is {major}.", warning
+    if profile == "shenandoah" and "oracle" in vendor.lower():
+        return f"{label} is not available in Oracle's Java builds ({vendor}).", warning
+    return None, warning
+
+
+def launch_java_major(instance, version, java="", manage_java=False):
+    """Major version of the java a launch of version runs on, None if unknown."""
+    with modulecli.engine.session() as launcher:
+        if manage_java:
+            # The managed java is the one the version asks for
+            java_version = launcher.version_manager.get_version(version).java_version or {}
+            return java_version.get("majorVersion", 8)
+        java_path = launcher.instance_manager.get(instance).get_java(java or None)
+    # Outside the session, it runs java
+    detected = detect_java(java_path)
+    return detected[0] if detected else None
+
+
+def apply_profile(instance, profile, ram, version=None, java="", manage_java=False):
+    """Points the instance's java.jvmargs in zucaro at the profile.
+
+    Only arguments a profile set are replaced, zucaro's own come back with
+    the default profile. Arguments set by hand are kept and ValueError
+    says why the profile wasn't applied."""
+    java_major = None
+    if profile in JAVA_DEPENDENT and version:
+        java_major = launch_java_major(instance, version, java, manage_java)
+    wanted = profile_args(profile, ram, java_major)
+
+    # zucaro rewrites the instance config on launch, start from the file
+    modulecli.engine.close_launcher()
+    with modulecli.engine.session() as launcher:
+        inst = launcher.instance_manager.get(instance)
+        current = inst.config.get("java.jvmargs") if "java.jvmargs" in inst.config else None
+        if current is not None and not current.startswith(PROFILE_MARKER):
+            if wanted is not None:
+                raise ValueError(f"The {PROFILES[profile][0]} profile was not applied, instance {instance} "
+                                 f"has JVM arguments set by hand: {current}")
+            return
+        if wanted is None:
+            if current is not None:
+                del inst.config["java.jvmargs"]
+        elif current != wanted:
+            inst.config["java.jvmargs"] = wanted
+        launcher.config_manager.commit_all_dirty()
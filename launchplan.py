@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import shlex
+import shutil
+import asyncio
+import hashlib
+import zipfile
+import threading
+from string import Template
+
+import modulecli
+
+# Resolved launch plans, next to config.json
+PLANS_FILE = "launch_plans.json"
+
+# Plans kept, the oldest are dropped first
+MAX_PLANS = 20
+
+# Folder inside the instance directory natives are extracted to, one
+# subfolder per plan so they survive between launches
+NATIVES_FOLDER = "picodulce-natives"
+
+# zucaro config keys a plan depends on. zucaro rewrites the instance config
+# on every launch, so these are compared instead of the file's mtime.
+CONFIG_KEYS = ("java.path", "java.memory.min", "java.memory.max", "java.jvmargs")
+
+_plans_lock = threading.Lock()
+
+
+def plan_key(instance, version, java="", ram="", manage_java=False):
+    # The loader is part of the version name (fabric-loader-..., forge ...)
+    return json.dumps([instance, version, java or "", str(ram or ""), bool(manage_java)])
+
+
+def load_plans(plans_file=PLANS_FILE):
+    try:
+        with open(plans_file, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_plans(plans, plans_file=PLANS_FILE):
+    temp_file = plans_file + ".tmp"
+    try:
+        with open(temp_file, "w") as f:
+            json.dump(plans, f)
+        os.replace(temp_file, plans_file)
+    except OSError as e:
+        print(f"Error saving launch plans: {e}")
+
+
+def fingerprint(paths):
+    stamps = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamps[path] = [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+def read_settings(config_paths):
+    settings = {}
+    for path in config_paths:
+        try:
+            with open(path, "r") as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            config = {}
+        settings[path] = {key: config.get(key) for key in CONFIG_KEYS}
+    return settings
+
+
+def get_plan(key, plans_file=PLANS_FILE):
+    """The cached plan for key, None when there is none or a version JSON,
+    library or java setting changed since it was resolved."""
+    with _plans_lock:
+        plan = load_plans(plans_file).get(key)
+    if plan is None:
+        return None
+    if fingerprint(plan["fingerprint"]) != plan["fingerprint"]:
+        return None
+    if read_settings(plan["settings"]) != plan["settings"]:
+        return None
+    if plan["natives"] and not os.path.isdir(plan["natives_dir"]):
+        return None
+    return plan
+
+
+def store_plan(plan, plans_file=PLANS_FILE):
+    with _plans_lock:
+        plans = load_plans(plans_file)
+        plans[plan["key"]] = plan
+        if len(plans) > MAX_PLANS:
+            for key in sorted(plans, key=lambda key: plans[key]["resolved"])[:len(plans) - MAX_PLANS]:
+                del plans[key]
+        save_plans(plans, plans_file)
+
+
+def forget_plans(plans_file=PLANS_FILE):
+    with _plans_lock:
+        try:
+            os.remove(plans_file)
+        except FileNotFoundError:
+            pass
+
+
+def _escape(value):
+    # Values are substituted twice, the second pass must leave them alone
+    return str(value).replace("$", "$$")
+
+
+def resolve_plan(instance, version, java="", ram="", manage_java=False, plans_file=PLANS_FILE):
+    """Resolves what `instance launch` would run and caches it.
+
+    Does everything zucaro does before it spawns java except downloading
+    and account handling: the java check, library rules, the classpath,
+    JVM and game arguments. Natives are extracted to a folder kept with
+    the instance instead of a temporary one."""
+    from zucaro.java import assert_java
+    from zucaro.java_manager import JavaManager
+    from zucaro.instance import process_arguments
+    from zucaro.utils import Directory, join_classpath
+
+    key = plan_key(instance, version, java, ram, manage_java)
+    # Resolving the version may download its JSON, a managed java may be
+    # downloaded and assert_java runs java. None of it holds the engine
+    # lock, the UI's queries would wait on it meanwhile.
+    launcher = modulecli.engine.get_launcher()
+    vobj = launcher.version_manager.get_version(version)
+    if manage_java:
+        java_path = str(JavaManager(launcher).get_java_path(vobj.version_name))
+    else:
+        with modulecli.engine.session() as launcher:
+            java_path = java or launcher.instance_manager.get(instance).get_java()
+    java_info = assert_java(java_path, vobj.java_version)
+
+    with modulecli.engine.session() as launcher:
+        inst = launcher.instance_manager.get(instance)
+        libraries_root = launcher.get_path(Directory.LIBRARIES)
+        versions_root = launcher.get_path(Directory.VERSIONS)
+        libraries = vobj.get_libraries(java_info)
+        classpath_files = [str(lib.get_abspath(libraries_root)) for lib in libraries if lib.is_classpath]
+        classpath_files.append(str(vobj.jarfile))
+        native_files = sorted({str(lib.get_abspath(libraries_root)) for lib in libraries if lib.is_native})
+
+        gamedir = str(inst.get_minecraft_dir())
+        natives_dir = os.path.join(str(inst.get_relpath()), NATIVES_FOLDER,
+                                   hashlib.sha1(key.encode()).hexdigest()[:12])
+        classpath = join_classpath(*classpath_files)
+
+        if hasattr(vobj.vspec, "minecraftArguments"):
+            game_args = shlex.split(vobj.vspec.minecraftArguments)
+            jvm_args = [f"-Djava.library.path={natives_dir}", "-cp", classpath]
+        else:
+            game_args, raw_jvm_args = process_arguments(vobj.vspec.arguments, java_info)
+            jvm_args = [Template(arg).substitute(
+                natives_directory=natives_dir,
+                launcher_name="zucaro",
+                launcher_version="1",
+                classpath=classpath,
+                version_name=vobj.version_name,
+                jar_name=vobj.jarname,
+                library_directory=libraries_root,
+                classpath_separator=os.pathsep,
+            ) for arg in raw_jvm_args]
+
+        # Everything but the account, that part is filled in by build_argv
+        game_args = [Template(arg).safe_substitute(
+            user_properties=_escape({}),
+            version_name=_escape(vobj.version_name),
+            game_directory=_escape(gamedir),
+            assets_root=_escape(launcher.get_path(Directory.ASSETS)),
+            assets_index_name=_escape(vobj.vspec.assets),
+            game_assets=_escape(vobj.get_virtual_asset_path()),
+            clientid="",
+            auth_xuid="",
+        ) for arg in game_args]
+
+        memory_min = ram or inst.config["java.memory.min"]
+        memory_max = ram or inst.config["java.memory.max"]
+        jvm_args += [f"-Xms{memory_min}", f"-Xmx{memory_max}"]
+        jvm_args += shlex.split(inst.config["java.jvmargs"])
+
+        version_files = [str(versions_root / v.version_name / f"{v.version_name}.json") for v in vobj.vspec.chain]
+        watched = version_files + classpath_files + native_files
+        config_paths = [str(inst.get_relpath("config.json")), str(launcher.get_path("config.json"))]
+
+    extract_natives(native_files, natives_dir)
+
+    plan = {
+        "key": key,
+        "resolved": time.time(),
+        "version": vobj.version_name,
+        "java": java_path,
+        "java_version": java_info.get("java.version"),
+        "cwd": gamedir,
+        "jvm_args": jvm_args,
+        "main_class": vobj.vspec.mainClass,
+        "game_args": game_args,
+        "natives": native_files,
+        "natives_dir": natives_dir,
+        "fingerprint": fingerprint(watched),
+        "settings": read_settings(config_paths),
+    }
+    store_plan(plan, plans_file)
+    return plan
+
+
+def extract_natives(archives, natives_dir):
+    # Same as zucaro's NativesExtractor, into a folder that is kept
+    shutil.rmtree(natives_dir, ignore_errors=True)
+    os.makedirs(natives_dir, exist_ok=True)
+    for archive in archives:
+        with zipfile.ZipFile(archive) as zf:
+            zf.extractall(path=natives_dir)
+
+
+def build_argv(plan, account_name=None, extra_jvm_args=()):
+    """The java command line of a plan for the default (or given) account.
+
+    The account is refreshed first like zucaro does, None is returned when
+    it can't launch the game so the caller can leave it to zucaro."""
+    from zucaro.errors import RefreshError
+
+    # Accounts may have changed since the long-lived launcher read them
+    modulecli.engine.close_launcher()
+    with modulecli.engine.session() as launcher:
+        account_manager = launcher.account_manager
+        account = account_manager.get(account_name) if account_name else account_manager.get_default()
+        if not account.can_launch_game():
+            return None
+        try:
+            asyncio.run(account.refresh())
+        except RefreshError as e:
+            print(f"Failed to refresh account due to an error: {e}")
+        # A refreshed token has to be on disk before the game uses it
+        launcher.config_manager.commit_all_dirty()
+
+        version_type, user_type = ("zucaro", "mojang") if account.online else ("zucaro/offline", "offline")
+        fields = {
+            "auth_player_name": account.gname,
+            "auth_uuid": account.uuid,
+            "auth_access_token": account.access_token,
+            "auth_session": "token:{}:{}".format(account.access_token, account.uuid),
+            "user_type": user_type,
+            "version_type": version_type,
+        }
+
+    game_args = [Template(arg).substitute(fields) for arg in plan["game_args"]]
+    return [plan["java"]] + plan["jvm_args"] + list(extra_jvm_args) + [plan["main_class"]] + game_args
@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import math
+import time
+import threading
+
+# Launch history, next to config.json
+HISTORY_FILE = "launch_history.jsonl"
+
+# The history is trimmed back to KEEP_RECORDS once it grows past MAX_RECORDS
+MAX_RECORDS = 1000
+KEEP_RECORDS = 500
+
+# Phase name -> (start mark, end mark), in launch order
+PHASES = (
+    ("account_check", "click", "accounts_checked"),
+    ("config_read", "accounts_checked", "config_read"),
+    ("zucaro_import", "config_read", "zucaro_imported"),
+    ("version_setup", "zucaro_imported", "libraries_started"),
+    ("libraries", "libraries_started", "assets_started"),
+    ("assets", "assets_started", "launching"),
+    ("jvm_spawn", "launching", "jvm_output"),
+)
+
+_history_lock = threading.Lock()
+
+
+class LaunchTimer:
+    """Timestamps the marks of one launch, from the Play click on.
+
+    finish() turns them into phase durations and appends the record to
+    the history. Marks can come from any thread, only the first time a
+    mark is hit counts."""
+
+    def __init__(self, history_file=HISTORY_FILE):
+        self.history_file = history_file
+        self.lock = threading.Lock()
+        self.marks = {}
+        self.info = {}
+        self.finished = False
+
+    def mark(self, name):
+        with self.lock:
+            self.marks.setdefault(name, time.monotonic())
+
+    def has(self, name):
+        return name in self.marks
+
+    def durations(self):
+        with self.lock:
+            marks = dict(self.marks)
+        durations = {}
+        for phase, start, end in PHASES:
+            if start in marks and end in marks:
+                durations[phase] = round((marks[end] - marks[start]) * 1000, 1)
+        # A version with every asset in place skips straight to launching
+        if "libraries" not in durations and "libraries_started" in marks and "launching" in marks:
+            durations["libraries"] = round((marks["launching"] - marks["libraries_started"]) * 1000, 1)
+        if "click" in marks:
+            durations["total"] = round((max(marks.values()) - marks["click"]) * 1000, 1)
+        return durations
+
+    def finish(self, ok=True, **info):
+        with self.lock:
+            if self.finished:
+                return None
+            self.finished = True
+        self.info.update(info)
+        record = {"time": time.time(), "ok": ok, "phases_ms": self.durations()}
+        record.update(self.info)
+        append_record(record, self.history_file)
+        return record
+
+
+def append_record(record, history_file=HISTORY_FILE):
+    with _history_lock:
+        try:
+            with open(history_file, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            trim_history(history_file)
+        except OSError as e:
+            print(f"Error saving launch timings: {e}")
+
+
+def trim_history(history_file=HISTORY_FILE):
+    with open(history_file, "r") as f:
+        lines = f.readlines()
+    if len(lines) <= MAX_RECORDS:
+        return
+    temp_file = history_file + ".tmp"
+    with open(temp_file, "w") as f:
+        f.writelines(lines[-KEEP_RECORDS:])
+    os.replace(temp_file, history_file)
+
+
+def load_history(history_file=HISTORY_FILE, last=None):
+    records = []
+    if not os.path.exists(history_file):
+        return records
+    with open(history_file, "r") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records[-last:] if last else records
+
+
+def percentile(values, fraction):
+    # Nearest rank, good enough for a few hundred launches
+    values = sorted(values)
+    index = max(0, min(len(values) - 1, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+def report(records):
+    """{phase: {"count", "median_ms", "p95_ms"}} over successful launches."""
+    phases = [phase for phase, _, _ in PHASES] + ["total"]
+    result = {}
+    for phase in phases:
+        values = [r["phases_ms"][phase] for r in records if r.get("ok") and phase in r.get("phases_ms", {})]
+        if values:
+            result[phase] = {
+                "count": len(values),
+                "median_ms": percentile(values, 0.5),
+                "p95_ms": percentile(values, 0.95),
+            }
+    return result
+
+
+def format_report(records=None):
+    if records is None:
+        records = load_history()
+    stats = report(records)
+    if not stats:
+        return "No launches recorded yet."
+    lines = [f"{'phase':<15}{'launches':>9}{'median ms':>12}{'p95 ms':>12}"]
+    for phase, entry in stats.items():
+        lines.append(f"{phase:<15}{entry['count']:>9}{entry['median_ms']:>12.1f}{entry['p95_ms']:>12.1f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # python launchstats.py [number of recent launches]
+    last = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    print(format_report(load_history(last=last)))
@@ -1,69 +1,404 @@
+import os
 import sys
-import threading
 import shlex
-import gc
+import signal
+import time
+import threading
 import re
 from io import StringIO
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QProgressBar, QPushButton, QHBoxLayout
-from PyQt5.QtCore import Qt, pyqtSignal, QObject, QTimer
+from collections import deque
+import modulecli
+import sessionlog
+import integrity
+import launchplan
+import jvmprofiles
+import appcds
+import gamemonitor
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QProgressBar, QPushButton, QHBoxLayout, QScrollArea, QWidget
+from PyQt5.QtCore import Qt, pyqtSignal, pyqtSlot, QObject, QTimer, QProcess, QProcessEnvironment, QCoreApplication
 
 ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
 
+# Printed by the child once zucaro is imported, for the launch timings
+ZUCARO_LOADED_MARKER = "Picodulce: zucaro loaded"
+
+# Runs zucaro in the child process. It gets its own process group so an
+# abort also stops the java process zucaro starts.
+CHILD_BOOTSTRAP = (
+    "import os\n"
+    "if hasattr(os, 'setpgrp'):\n"
+    "    os.setpgrp()\n"
+    "from zucaro.cli.main import zucaro_cli\n"
+    f"print({ZUCARO_LOADED_MARKER!r}, flush=True)\n"
+    "zucaro_cli(prog_name='zucaro')\n"
+)
+
+# A line without a newline is cut after this many bytes
+MAX_LINE_BYTES = 64 * 1024
+
+# Seconds between asking the child to stop and killing it
+TERMINATE_GRACE = 5
+
+# Status updates per second sent to the windows, every line is still kept
+LOG_UPDATE_HZ = 20
+
+# Lines kept per launch or prepare for later inspection
+LOG_RING_LINES = 5000
+
+# Output is split into lines on both, \r is how progress bars redraw
+LINE_BREAK = re.compile(r'[\r\n]')
+
+# Versions prepared at the same time by a PrepareQueue
+DEFAULT_PARALLEL_PREPARES = 3
+
+# Share of a prepare job's progress bar each download phase covers
+PREPARE_PHASES = {"libraries": (0.0, 0.5), "assets": (0.5, 1.0)}
+
+# Seconds after startup before the last played version is checked
+SPECULATIVE_DELAY = 5
+
+# Nice value of the thread doing that check
+SPECULATIVE_NICE = 10
+
 def strip_ansi(text):
     return ANSI_ESCAPE.sub('', text)
 
+def format_size(size):
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+def is_launch_line(text):
+    lower_text = text.lower()
+    return "launching" in lower_text and ("game" in lower_text or "version" in lower_text or "minecraft" in lower_text)
+
+def observe_launch_line(timer, text):
+    # Moves a launchstats.LaunchTimer along from zucaro's log lines
+    if timer.has("launching"):
+        timer.mark("jvm_output")
+    elif ZUCARO_LOADED_MARKER in text:
+        timer.mark("zucaro_imported")
+    elif "Checking libraries" in text:
+        timer.mark("libraries_started")
+    elif "Checking" in text and "assets" in text:
+        timer.mark("assets_started")
+    elif is_launch_line(text):
+        timer.mark("launching")
+
 
 class LaunchSignals(QObject):
     log_update = pyqtSignal(str)
     launch_complete = pyqtSignal()
     launch_aborted = pyqtSignal()
     cleanup_done = pyqtSignal()
+    progress_update = pyqtSignal(object)
+    integrity_checked = pyqtSignal(str)
+    direct_launch = pyqtSignal(object)
 
 
 class AbortException(Exception):
     pass
 
 
+class _LogFlusher(QObject):
+    """One QTimer on the GUI thread sending the trailing lines of every
+    LogCoalescer that got lines too soon after its last update."""
+
+    _wake = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush_due)
+        # Queued when scheduled from a capture's thread
+        self._wake.connect(self.on_wake)
+
+    def schedule(self, coalescer):
+        with self.lock:
+            self.pending.add(coalescer)
+        self._wake.emit()
+
+    # A decorated slot runs on the flusher's thread, not the connecting one
+    @pyqtSlot()
+    def on_wake(self):
+        if not self.timer.isActive():
+            self.timer.start(int(1000 / LOG_UPDATE_HZ))
+
+    @pyqtSlot()
+    def flush_due(self):
+        now = time.monotonic()
+        with self.lock:
+            due = [coalescer for coalescer in self.pending if now - coalescer.last_emit >= coalescer.interval]
+            self.pending.difference_update(due)
+            if not self.pending:
+                self.timer.stop()
+        for coalescer in due:
+            coalescer.flush()
+
+
+_log_flusher = None
+_log_flusher_lock = threading.Lock()
+
+
+def _get_log_flusher():
+    global _log_flusher
+    with _log_flusher_lock:
+        if _log_flusher is None:
+            _log_flusher = _LogFlusher()
+            # Captures are often created on the thread running zucaro
+            app = QCoreApplication.instance()
+            if app is not None:
+                _log_flusher.moveToThread(app.thread())
+        return _log_flusher
+
+
+class LogCoalescer:
+    """Keeps every line in a ring buffer but only forwards the latest one,
+    at most `rate` times per second.
+
+    Lines are stored as received, ANSI codes are stripped only from the
+    lines that get shown or read back."""
+
+    def __init__(self, emit, rate=LOG_UPDATE_HZ, ring_size=LOG_RING_LINES, session=None):
+        self.emit = emit
+        # Optional sessionlog.SessionLog every line is also written to
+        self.session = session
+        self.interval = 1.0 / rate if rate else 0.0
+        self.ring = deque(maxlen=ring_size)
+        self.lock = threading.Lock()
+        self.latest = None
+        self.last_emit = 0.0
+        self.scheduled = False
+
+    def add(self, line):
+        if self.session is not None:
+            self.session.write(strip_ansi(line))
+        with self.lock:
+            self.ring.append(line)
+            self.latest = line
+            now = time.monotonic()
+            wait = self.interval - (now - self.last_emit)
+            if wait > 0:
+                # Too soon, the trailing flush shows whatever is latest by then
+                if self.scheduled:
+                    return
+                self.scheduled = True
+                line = None
+            else:
+                line = self._take(now)
+        if line is None:
+            _get_log_flusher().schedule(self)
+        else:
+            self._send(line)
+
+    def flush(self):
+        with self.lock:
+            self.scheduled = False
+            if self.latest is None:
+                return
+            line = self._take(time.monotonic())
+        self._send(line)
+
+    def _take(self, now):
+        line, self.latest = self.latest, None
+        self.last_emit = now
+        return line
+
+    def _send(self, line):
+        text = strip_ansi(line).strip()
+        if not text:
+            return
+        try:
+            self.emit(text)
+        except RuntimeError:
+            # Signal/Object might be deleted
+            pass
+
+    def lines(self):
+        with self.lock:
+            return [strip_ansi(line) for line in self.ring]
+
+
 class StreamingCapture(StringIO):
-    def __init__(self, log_signal, launch_signal):
+    def __init__(self, log_signal, launch_signal, rate=LOG_UPDATE_HZ, ring_size=LOG_RING_LINES, session=None,
+                 line_hook=None):
         super().__init__()
+        self.line_hook = line_hook
         self.log_signal = log_signal
         self.launch_signal = launch_signal
         self.launch_detected = False
         self.abort_requested = False
+        self.log = LogCoalescer(log_signal.emit, rate, ring_size, session)
+        self.partial = ""
     
     def write(self, text):
         if self.abort_requested:
             raise AbortException("Launch aborted by user")
 
         if text:
-            # Strip ANSI escape codes (common in unix terminals for colors/progress)
-            text = strip_ansi(text)
-            
-            # Handle carriage returns by taking the last part of a line if it contains \r
-            # This should not be necesary in any case, but ill implement it just in case
-            if '\r' in text:
-                parts = text.split('\r')
-                text = parts[-1]
-
-            if text.strip():
-                # Check if signal is still valid before emitting
-                try:
-                    self.log_signal.emit(text.strip())
-                except RuntimeError:
-                    # Signal/Object might be deleted
-                    pass
-                
+            *lines, self.partial = LINE_BREAK.split(self.partial + text)
+            for line in lines:
+                if not line.strip():
+                    continue
+                self.log.add(line)
+                if self.line_hook is not None:
+                    self.line_hook(line)
+
                 if not self.launch_detected and self.launch_signal:
-                    lower_text = text.lower()
-                    if "launching" in lower_text and ("game" in lower_text or "version" in lower_text or "minecraft" in lower_text):
+                    if is_launch_line(line):
                         self.launch_detected = True
                         try:
                             self.launch_signal.emit()
                         except RuntimeError:
                             pass
-        
-        return super().write(text)
+
+        # Nothing else is kept, the ring buffer holds the recent lines
+        return len(text)
+
+    def flush_status(self):
+        # Push out the last line of output, called once the command ended
+        if self.partial.strip():
+            self.log.add(self.partial)
+            self.partial = ""
+        self.log.flush()
+
+    def lines(self):
+        return self.log.lines()
+
+    def getvalue(self):
+        return "\n".join(self.lines())
+
+
+class GameProcess(QObject):
+    """`zucaro instance launch` running as a child process.
+
+    Output of zucaro and the game is read from a pipe as it arrives and
+    split into lines, so a chatty game never runs Python code on the
+    launcher's threads per write. Instances keep themselves alive until
+    the child exits, the launch window usually closes long before.
+
+    Given argv, java is started directly from a cached launch plan and
+    command is only used to invalidate the query cache."""
+
+    # Coalesced like StreamingCapture, all lines are in self.log
+    line_received = pyqtSignal(str)
+    launch_detected = pyqtSignal()
+    exited = pyqtSignal(int, bool)
+
+    running = set()
+
+    def __init__(self, command, session=None, timer=None, argv=None, cwd=None):
+        super().__init__()
+        self.command = command
+        self.argv = argv
+        # launchstats.LaunchTimer, finished on the first output of the game
+        self.timer = timer
+        # Kept open until the game exits, not only while the window shows
+        self.session = session
+        self.buffer = b""
+        self.detected = False
+        self.aborted = False
+        self.log = LogCoalescer(self.line_received.emit, session=session)
+
+        self.process = QProcess(self)
+        self.process.setProcessChannelMode(QProcess.MergedChannels)
+        environment = QProcessEnvironment.systemEnvironment()
+        environment.insert("PYTHONUNBUFFERED", "1")
+        self.process.setProcessEnvironment(environment)
+        if cwd:
+            self.process.setWorkingDirectory(cwd)
+        self.process.readyReadStandardOutput.connect(self.read_output)
+        self.process.finished.connect(self.on_finished)
+        self.process.errorOccurred.connect(self.on_error)
+
+    def start(self):
+        GameProcess.running.add(self)
+        if self.argv:
+            if self.timer is not None:
+                self.timer.mark("launching")
+            self.process.start(self.argv[0], self.argv[1:])
+        else:
+            self.process.start(sys.executable, ["-c", CHILD_BOOTSTRAP] + shlex.split(self.command))
+
+    def is_running(self):
+        return self.process.state() != QProcess.NotRunning
+
+    def read_output(self):
+        self.buffer += bytes(self.process.readAllStandardOutput())
+        *lines, self.buffer = self.buffer.split(b"\n")
+        if len(self.buffer) > MAX_LINE_BYTES:
+            lines.append(self.buffer)
+            self.buffer = b""
+        for line in lines:
+            self.handle_line(line)
+
+    def handle_line(self, line):
+        # Progress bars redraw with \r, only the last state matters
+        text = line.split(b"\r")[-1].decode("utf-8", errors="replace")
+        if not text.strip():
+            return
+        self.log.add(text)
+        if self.timer is not None and not self.timer.finished:
+            observe_launch_line(self.timer, text)
+            if self.timer.has("jvm_output"):
+                self.timer.finish(ok=True, mode="subprocess")
+        # Without zucaro in between the first line already comes from the game
+        if not self.detected and (self.argv or is_launch_line(text)):
+            self.detected = True
+            # Preparing the version is done by now
+            modulecli.cache.invalidate_for(self.command)
+            self.launch_detected.emit()
+
+    def terminate(self):
+        if not self.is_running():
+            return
+        self.aborted = True
+        self.send_signal(getattr(signal, "SIGTERM", None), self.process.terminate)
+        QTimer.singleShot(TERMINATE_GRACE * 1000, self.force_kill)
+
+    def force_kill(self):
+        if self.is_running():
+            self.send_signal(getattr(signal, "SIGKILL", None), self.process.kill)
+
+    def send_signal(self, signum, fallback):
+        pid = self.process.processId()
+        if signum is not None and hasattr(os, "killpg") and pid:
+            try:
+                os.killpg(pid, signum)
+                return
+            except OSError:
+                pass
+        fallback()
+
+    def on_error(self, error):
+        if error == QProcess.FailedToStart:
+            self.line_received.emit(f"Error: could not start zucaro ({self.process.errorString()})")
+            self.on_finished(-1, QProcess.CrashExit)
+
+    def on_finished(self, exit_code, exit_status):
+        if self not in GameProcess.running:
+            return
+        if self.buffer:
+            self.handle_line(self.buffer)
+            self.buffer = b""
+        self.log.flush()
+        if self.session is not None:
+            self.session.close()
+        if self.timer is not None:
+            self.timer.finish(ok=self.detected and not self.aborted, mode="subprocess", exit_code=exit_code)
+        GameProcess.running.discard(self)
+        modulecli.cache.invalidate_for(self.command)
+        self.exited.emit(exit_code, self.aborted)
 
 
 class LaunchWindow(QDialog):
@@ -100,12 +435,28 @@ class LaunchWindow(QDialog):
         self.signals.launch_complete.connect(self.on_launch_complete)
         self.signals.launch_aborted.connect(self.on_launch_aborted)
         self.signals.cleanup_done.connect(self.on_cleanup_done)
+        self.signals.integrity_checked.connect(self.on_integrity_checked)
+        self.signals.direct_launch.connect(self.on_direct_launch)
         
         self.launch_detected = False
         self.closing_scheduled = False
         self.aborting = False
         self.capture_streams = []
         self.thread_running = False
+        self.game_process = None
+        self.session_log = None
+        self.launch_timer = None
+        self.in_subprocess = False
+        # launchplan.plan_key arguments, a cached plan skips zucaro entirely
+        self.plan_request = None
+        # (instance, profile, ram) written to the instance before the launch
+        self.jvm_profile = None
+        # Use or record a class data sharing archive on launches from a plan
+        self.class_data_sharing = False
+        # Called with the gamemonitor summary once the game exits, None
+        # leaves the game unmonitored
+        self.monitor_callback = None
+        self.game_monitor = None
     
     def update_status(self, text):
         if len(text) > 100:
@@ -136,6 +487,8 @@ class LaunchWindow(QDialog):
             self.aborting = True
             self.status_label.setText("Aborting...")
             self.cancel_button.setEnabled(False)
+            if self.game_process is not None:
+                self.game_process.terminate()
             # Signal streams to stop
             for stream in self.capture_streams:
                 stream.abort_requested = True
@@ -153,49 +506,177 @@ class LaunchWindow(QDialog):
         else:
             event.accept()
 
+    def check_and_launch(self, command, version, full_verify=False):
+        # Only files that changed since the last check of this version are
+        # hashed, zucaro is asked to verify everything when one is corrupt
+        self.thread_running = True
+        self.update_status("Checking game files...")
+        thread = threading.Thread(target=self._run_integrity_check, args=(command, version, full_verify), daemon=True)
+        thread.start()
+
+    def _run_integrity_check(self, command, version, full_verify):
+        if self.jvm_profile is not None:
+            try:
+                jvmprofiles.apply_profile(*self.jvm_profile)
+            except (Exception, SystemExit) as e:
+                print(f"Error applying the JVM profile: {e}")
+                self.signals.log_update.emit(f"Error applying the JVM profile: {e}")
+        try:
+            result = integrity.check_version(version, full=full_verify)
+            print(result.summary())
+            if self.session_log is not None:
+                self.session_log.write(result.summary())
+            if self.launch_timer is not None:
+                self.launch_timer.info.update(integrity_ms=round(result.seconds * 1000, 1),
+                                              integrity_hashed=result.hashed, verified=bool(result.mismatched))
+            if result.mismatched:
+                self.signals.log_update.emit(f"{len(result.mismatched)} game files corrupt, verifying...")
+                command += " --verify"
+            elif result.missing:
+                # zucaro downloads missing files on a normal launch
+                self.signals.log_update.emit(f"{len(result.missing)} game files missing, downloading...")
+            elif self.plan_request is not None:
+                self.launch_from_plan(command)
+                return
+        except (Exception, SystemExit) as e:
+            # zucaro still checks that every file exists, as it always did
+            print(f"Error checking game files of {version}: {e}")
+            if full_verify:
+                command += " --verify"
+        self.signals.integrity_checked.emit(command)
+
+    def launch_from_plan(self, command):
+        # Every file is in place, spawn java from the cached plan. Without one
+        # zucaro launches this time and the plan is resolved meanwhile.
+        key = launchplan.plan_key(**self.plan_request)
+        argv = None
+        try:
+            plan = launchplan.get_plan(key)
+            if plan is not None:
+                cds_args, cds_mode = appcds.cds_args(plan) if self.class_data_sharing else ([], None)
+                gc_log = self.gc_log_path()
+                gc_args = gamemonitor.gc_log_args(gc_log, plan.get("java_version"))
+                argv = launchplan.build_argv(plan, extra_jvm_args=cds_args + gc_args)
+        except (Exception, SystemExit) as e:
+            print(f"Error using the cached launch plan: {e}")
+        if argv:
+            print(f"Launching {self.plan_request['version']} from the cached launch plan")
+            if self.launch_timer is not None:
+                self.launch_timer.info.update(plan="cached", cds=cds_mode)
+            self.signals.direct_launch.emit((command, argv, plan["cwd"], gc_log if gc_args else None))
+            return
+
+        self.signals.integrity_checked.emit(command)
+        try:
+            launchplan.resolve_plan(**self.plan_request)
+        except (Exception, SystemExit) as e:
+            print(f"Error resolving the launch plan: {e}")
+
+    def on_direct_launch(self, launch):
+        command, argv, cwd, gc_log = launch
+        if self.aborting:
+            self.on_launch_aborted()
+            self.on_cleanup_done()
+        else:
+            self.launch_game_process(command, argv, cwd, gc_log)
+
+    def gc_log_path(self):
+        # Next to the session log, pruned with it
+        if self.monitor_callback is None or self.session_log is None:
+            return None
+        return os.path.join(self.session_log.log_dir, self.session_log.session + sessionlog.GC_LOG_SUFFIX)
+
+    def start_monitor(self, root_pid, direct=False, gc_log=None):
+        if self.monitor_callback is None or not gamemonitor.available() or not root_pid:
+            return
+        self.game_monitor = gamemonitor.GameMonitor(root_pid, direct=direct, gc_log=gc_log)
+        self.game_monitor.finished.connect(self.monitor_callback)
+        self.game_monitor.start()
+
+    def on_integrity_checked(self, command):
+        if self.aborting:
+            self.on_launch_aborted()
+            self.on_cleanup_done()
+        elif self.in_subprocess:
+            self.launch_game_process(command)
+        else:
+            self.launch_game(command)
+
     def launch_game(self, command):
         self.thread_running = True
         thread = threading.Thread(target=self._run_launch, args=(command,), daemon=True)
         thread.start()
+        # zucaro starts java as a child of the launcher itself
+        self.start_monitor(os.getpid())
+
+    def launch_game_process(self, command, argv=None, cwd=None, gc_log=None):
+        self.thread_running = True
+        self.game_process = GameProcess(command, self.session_log, self.launch_timer, argv, cwd)
+        self.game_process.line_received.connect(self.update_status)
+        self.game_process.launch_detected.connect(self.on_launch_complete)
+        self.game_process.exited.connect(self.on_process_exited)
+        # The game outlives this window, stop listening once it is closed
+        self.finished.connect(self.detach_process)
+        self.game_process.process.started.connect(
+            lambda: self.start_monitor(self.game_process.process.processId(), bool(argv), gc_log))
+        self.game_process.start()
+
+    def on_process_exited(self, exit_code, aborted):
+        if aborted:
+            self.on_launch_aborted()
+        else:
+            if exit_code != 0:
+                self.update_status(f"zucaro exited with code {exit_code}")
+            self.on_launch_complete()
+        self.on_cleanup_done()
+
+    def detach_process(self):
+        if self.game_process is None:
+            return
+        for signal_, slot in ((self.game_process.line_received, self.update_status),
+                              (self.game_process.launch_detected, self.on_launch_complete),
+                              (self.game_process.exited, self.on_process_exited)):
+            try:
+                signal_.disconnect(slot)
+            except TypeError:
+                pass
     
+    def observe_line(self, text):
+        # The game's output isn't captured in this mode, the timings end
+        # when zucaro starts the JVM
+        timer = self.launch_timer
+        if timer is not None and not timer.finished:
+            observe_launch_line(timer, text)
+            if timer.has("launching"):
+                timer.finish(ok=True, mode="thread")
+
     def _run_launch(self, command):
         try:
-            modules_to_remove = [mod for mod in sys.modules if mod.startswith('zucaro')]
-            for mod in modules_to_remove:
-                del sys.modules[mod]
-            gc.collect()
-
-            from zucaro.cli.main import zucaro_cli
-            
-            old_stdout, old_stderr = sys.stdout, sys.stderr
-            
-            stdout_capture = StreamingCapture(self.signals.log_update, self.signals.launch_complete)
-            stderr_capture = StreamingCapture(self.signals.log_update, self.signals.launch_complete)
+            if self.launch_timer is not None:
+                modulecli.engine.load()
+                self.launch_timer.mark("zucaro_imported")
+            stdout_capture = StreamingCapture(self.signals.log_update, self.signals.launch_complete,
+                                              session=self.session_log, line_hook=self.observe_line)
+            stderr_capture = StreamingCapture(self.signals.log_update, self.signals.launch_complete,
+                                              session=self.session_log, line_hook=self.observe_line)
             
             self.capture_streams = [stdout_capture, stderr_capture]
             
-            sys.stdout = stdout_capture
-            sys.stderr = stderr_capture
-            
             try:
-                zucaro_cli.main(args=shlex.split(command), standalone_mode=False)
+                modulecli.engine.run(command, stdout_capture, stderr_capture, standalone_mode=False)
             except AbortException:
                 self.signals.launch_aborted.emit()
-            except SystemExit:
-                pass
             except Exception as e:
                 self.signals.log_update.emit(f"Error: {str(e)}")
             finally:
-                sys.stdout = old_stdout
-                sys.stderr = old_stderr
-                
+                stdout_capture.flush_status()
+                stderr_capture.flush_status()
+                if self.session_log is not None:
+                    self.session_log.close()
+                if self.launch_timer is not None:
+                    self.launch_timer.finish(ok=False, mode="thread")
                 if not stdout_capture.launch_detected and not stderr_capture.launch_detected and not stdout_capture.abort_requested:
                      self.signals.launch_complete.emit()
-
-                modules_to_remove = [mod for mod in sys.modules if mod.startswith('zucaro')]
-                for mod in modules_to_remove:
-                    del sys.modules[mod]
-                gc.collect()
                 
                 self.signals.cleanup_done.emit()
         
@@ -222,9 +703,14 @@ class PrepareWindow(QDialog):
         layout.addWidget(self.status_label)
         
         self.progress_bar = QProgressBar()
-        self.progress_bar.setRange(0, 0)  # Indeterminate progress
+        self.progress_bar.setRange(0, 0)  # Indeterminate until zucaro reports sizes
         self.progress_bar.setTextVisible(False)
         layout.addWidget(self.progress_bar)
+
+        # Amount done, throughput and ETA of the current download
+        self.detail_label = QLabel("")
+        self.detail_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.detail_label)
         
         # Add a manual close/cancel button
         button_layout = QHBoxLayout()
@@ -238,6 +724,7 @@ class PrepareWindow(QDialog):
         
         self.signals = LaunchSignals()
         self.signals.log_update.connect(self.update_status)
+        self.signals.progress_update.connect(self.on_progress)
         self.signals.launch_complete.connect(self.on_prepare_complete)
         self.signals.launch_aborted.connect(self.on_prepare_aborted)
         self.signals.cleanup_done.connect(self.on_cleanup_done)
@@ -246,34 +733,48 @@ class PrepareWindow(QDialog):
         self.capture_streams = []
         self.thread_running = False
         self.success = False
+        self.downloading = False
+        self.session_log = None
 
     def update_status(self, text):
-        # Parse output for progress updates
-        
-        if "Downloading" in text and "libraries" in text:
-             try:
-                 count = int(re.search(r'\d+', text).group())
-                 self.status_label.setText(f"Downloading {count} libraries...")
-             except Exception:
-                 self.status_label.setText(text)
-        elif "Checking" in text and "assets" in text:
-             try:
-                 count = int(re.search(r'\d+', text).group())
-                 self.status_label.setText(f"Checking {count} assets...")
-             except Exception:
-                 self.status_label.setText(text)
-        elif "Jar file" in text and "downloaded" in text:
-            self.status_label.setText("Downloading game jar...")
-        elif "Checking libraries" in text:
-            self.status_label.setText("Checking libraries...")
+        # Progress events describe downloads better than the log lines do
+        if self.downloading:
+            return
+        if len(text) > 100:
+            text = text[:97] + "..."
+        self.status_label.setText(text)
+
+    def on_progress(self, event):
+        if self.aborting:
+            return
+        if not event.total:
+            # A phase started, zucaro is checking what it has to download
+            self.downloading = False
+            self.status_label.setText(f"Checking {event.phase}...")
+            self.progress_bar.setRange(0, 0)
+            self.detail_label.setText("")
+            return
+
+        self.downloading = event.done < event.total
+        self.status_label.setText(f"Downloading {event.phase}...")
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setValue(int(event.done * 1000 / event.total))
+
+        if event.unit == "B":
+            detail = f"{format_size(event.done)} / {format_size(event.total)}"
         else:
-            if len(text) > 100:
-                text = text[:97] + "..."
-            self.status_label.setText(text)
+            detail = f"{event.done} / {event.total} files"
+        detail += f" ({event.done * 100 // event.total}%)"
+        if event.bytes_per_second:
+            detail += f" - {format_size(event.bytes_per_second)}/s"
+        if event.eta is not None and event.done < event.total:
+            detail += f" - ETA {format_eta(event.eta)}"
+        self.detail_label.setText(detail)
 
     def on_prepare_complete(self):
         if not self.aborting:
             self.success = True
+            self.downloading = False
             self.status_label.setText("Version prepared successfully!")
             self.progress_bar.setRange(0, 100)
             self.progress_bar.setValue(100)
@@ -314,48 +815,34 @@ class PrepareWindow(QDialog):
 
     def prepare_version(self, version):
         command = f"version prepare {version}"
+        self.version = version
         self.thread_running = True
         thread = threading.Thread(target=self._run_prepare, args=(command,), daemon=True)
         thread.start()
 
     def _run_prepare(self, command):
         try:
-            modules_to_remove = [mod for mod in sys.modules if mod.startswith('zucaro')]
-            for mod in modules_to_remove:
-                del sys.modules[mod]
-            gc.collect()
-
-            from zucaro.cli.main import zucaro_cli
-            
-            old_stdout, old_stderr = sys.stdout, sys.stderr
-            
-            stdout_capture = StreamingCapture(self.signals.log_update, None)
-            stderr_capture = StreamingCapture(self.signals.log_update, None)
+            stdout_capture = StreamingCapture(self.signals.log_update, None, session=self.session_log)
+            stderr_capture = StreamingCapture(self.signals.log_update, None, session=self.session_log)
             
             self.capture_streams = [stdout_capture, stderr_capture]
             
-            sys.stdout = stdout_capture
-            sys.stderr = stderr_capture
-            
             try:
-                zucaro_cli.main(args=shlex.split(command), standalone_mode=False)
+                with modulecli.progress_sink(self.signals.progress_update.emit, lambda: self.aborting):
+                    exit_code = modulecli.engine.run(command, stdout_capture, stderr_capture, standalone_mode=False)
+                if exit_code == 0 and not self.aborting:
+                    record_integrity(self.version, self.signals.log_update.emit)
             except AbortException:
                 self.signals.launch_aborted.emit()
-            except SystemExit:
-                pass
             except Exception as e:
                 self.signals.log_update.emit(f"Error: {str(e)}")
             finally:
-                sys.stdout = old_stdout
-                sys.stderr = old_stderr
-                
+                stdout_capture.flush_status()
+                stderr_capture.flush_status()
+                if self.session_log is not None:
+                    self.session_log.close()
                 if not stdout_capture.abort_requested:
                      self.signals.launch_complete.emit()
-
-                modules_to_remove = [mod for mod in sys.modules if mod.startswith('zucaro')]
-                for mod in modules_to_remove:
-                    del sys.modules[mod]
-                gc.collect()
                 
                 self.signals.cleanup_done.emit()
         
@@ -367,14 +854,435 @@ class PrepareWindow(QDialog):
                 pass
 
 
-def launch_instance_with_window(command, parent=None):
+class PrepareJob:
+    def __init__(self, index, version, command=None):
+        self.index = index
+        self.version = version
+        self.command = command or f"version prepare {version}"
+        # queued, running, done, failed or cancelled
+        self.state = "queued"
+        self.fraction = 0.0
+        self.status = "Queued"
+        self.event = None
+        self.cancelled = False
+        self.captures = []
+
+    def is_finished(self):
+        return self.state in ("done", "failed", "cancelled")
+
+
+class _JobLog:
+    # Looks like a signal to StreamingCapture, tags lines with the job
+    def __init__(self, signal, index):
+        self.signal = signal
+        self.index = index
+
+    def emit(self, text):
+        self.signal.emit(self.index, text)
+
+
+class PrepareQueueSignals(QObject):
+    job_log = pyqtSignal(int, str)
+    job_progress = pyqtSignal(int, object)
+    job_done = pyqtSignal(int, bool)
+
+
+class PrepareQueue(QObject):
+    """Prepares many versions, at most `max_parallel` at the same time.
+
+    Jobs share zucaro's warm engine. Files that several of them need are
+    downloaded once (see modulecli._install_shared_downloads). Any job
+    can be cancelled without touching the others."""
+
+    job_changed = pyqtSignal(int)
+    all_finished = pyqtSignal()
+
+    def __init__(self, max_parallel=DEFAULT_PARALLEL_PREPARES, parent=None, log_dir=None):
+        super().__init__(parent)
+        self.max_parallel = max(1, max_parallel)
+        self.log_dir = log_dir
+        self.jobs = []
+        self.signals = PrepareQueueSignals()
+        self.signals.job_log.connect(self.on_job_log)
+        self.signals.job_progress.connect(self.on_job_progress)
+        self.signals.job_done.connect(self.on_job_done)
+
+    def add(self, version, command=None):
+        job = PrepareJob(len(self.jobs), version, command)
+        self.jobs.append(job)
+        return job
+
+    def start(self):
+        self.schedule()
+
+    def schedule(self):
+        running = sum(1 for job in self.jobs if job.state == "running")
+        for job in self.jobs:
+            if running >= self.max_parallel:
+                break
+            if job.state == "queued":
+                self.run_job(job)
+                running += 1
+        if all(job.is_finished() for job in self.jobs):
+            self.all_finished.emit()
+
+    def run_job(self, job):
+        job.state = "running"
+        job.status = "Starting..."
+        self.job_changed.emit(job.index)
+        thread = threading.Thread(target=self._run_job, args=(job,), daemon=True)
+        thread.start()
+
+    def _run_job(self, job):
+        ok = False
+        session = sessionlog.open_session_log(self.log_dir, f"prepare-{job.version}")
+        try:
+            log = _JobLog(self.signals.job_log, job.index)
+            stdout_capture = StreamingCapture(log, None, session=session)
+            stderr_capture = StreamingCapture(log, None, session=session)
+            job.captures = [stdout_capture, stderr_capture]
+            # The job may have been cancelled before its captures existed
+            if job.cancelled:
+                return
+            try:
+                progress = lambda event: self.signals.job_progress.emit(job.index, event)
+                with modulecli.progress_sink(progress, lambda: job.cancelled):
+                    exit_code = modulecli.engine.run(job.command, stdout_capture, stderr_capture, standalone_mode=False)
+                ok = exit_code == 0 and not job.cancelled
+                if ok:
+                    record_integrity(job.version, log.emit)
+            except AbortException:
+                pass
+            except Exception as e:
+                self.signals.job_log.emit(job.index, f"Error: {str(e)}")
+            finally:
+                stdout_capture.flush_status()
+                stderr_capture.flush_status()
+        finally:
+            if session is not None:
+                session.close()
+            self.signals.job_done.emit(job.index, ok)
+
+    def cancel(self, index):
+        self._cancel_job(self.jobs[index])
+        self.schedule()
+
+    def cancel_all(self):
+        # Queued jobs first, a slot freed meanwhile must not start one of them
+        for job in self.jobs:
+            if job.state == "queued":
+                self._cancel_job(job)
+        for job in self.jobs:
+            if job.state == "running":
+                self._cancel_job(job)
+        self.schedule()
+
+    def _cancel_job(self, job):
+        if job.state == "queued":
+            job.state = "cancelled"
+            job.status = "Cancelled"
+            self.job_changed.emit(job.index)
+        elif job.state == "running" and not job.cancelled:
+            job.cancelled = True
+            job.status = "Cancelling..."
+            for capture in job.captures:
+                capture.abort_requested = True
+            self.job_changed.emit(job.index)
+
+    def is_running(self):
+        return any(job.state == "running" for job in self.jobs)
+
+    def aggregate(self):
+        jobs = [job for job in self.jobs if job.state != "cancelled"]
+        if not jobs:
+            return 1.0
+        return sum(1.0 if job.is_finished() else job.fraction for job in jobs) / len(jobs)
+
+    def results(self):
+        return {job.version: job.state == "done" for job in self.jobs}
+
+    def on_job_log(self, index, text):
+        job = self.jobs[index]
+        # Download progress says more than the log while it lasts
+        if job.state == "running" and not job.cancelled and job.event is None:
+            job.status = text
+            self.job_changed.emit(index)
+
+    def on_job_progress(self, index, event):
+        job = self.jobs[index]
+        if job.is_finished() or job.cancelled:
+            return
+        start, end = PREPARE_PHASES.get(event.phase, (0.0, 1.0))
+        fraction = event.done / event.total if event.total else 0.0
+        job.fraction = max(job.fraction, start + (end - start) * fraction)
+        if not event.total:
+            job.event = None
+            job.status = f"Checking {event.phase}..."
+        else:
+            job.event = event if event.done < event.total else None
+            job.status = f"Downloading {event.phase} ({event.done * 100 // event.total}%)"
+            if event.bytes_per_second:
+                job.status += f" - {format_size(event.bytes_per_second)}/s"
+            if event.eta is not None and event.done < event.total:
+                job.status += f" - ETA {format_eta(event.eta)}"
+        self.job_changed.emit(index)
+
+    def on_job_done(self, index, ok):
+        job = self.jobs[index]
+        if job.cancelled:
+            job.state, job.status = "cancelled", "Cancelled"
+        elif ok:
+            job.state, job.status, job.fraction = "done", "Prepared", 1.0
+        else:
+            job.state, job.status = "failed", "Failed"
+        job.captures = []
+        self.job_changed.emit(index)
+        self.schedule()
+
+
+class PrepareQueueWindow(QDialog):
+    def __init__(self, queue, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Preparing Versions")
+        self.setModal(True)
+        self.resize(480, 360)
+        self.queue = queue
+
+        layout = QVBoxLayout()
+
+        self.status_label = QLabel("Initializing...")
+        self.status_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.status_label)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        layout.addWidget(self.progress_bar)
+
+        # One row per job: name, progress, status and its own cancel button
+        jobs_widget = QWidget()
+        jobs_layout = QVBoxLayout(jobs_widget)
+        self.rows = []
+        for job in queue.jobs:
+            name_label = QLabel(job.version)
+            job_bar = QProgressBar()
+            job_bar.setRange(0, 1000)
+            job_bar.setTextVisible(False)
+            job_status = QLabel(job.status)
+            cancel_button = QPushButton("Cancel")
+            cancel_button.clicked.connect(lambda checked, index=job.index: self.queue.cancel(index))
+
+            top = QHBoxLayout()
+            top.addWidget(name_label)
+            top.addStretch()
+            top.addWidget(cancel_button)
+            jobs_layout.addLayout(top)
+            jobs_layout.addWidget(job_bar)
+            jobs_layout.addWidget(job_status)
+            self.rows.append((job_bar, job_status, cancel_button))
+        jobs_layout.addStretch()
+
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(jobs_widget)
+        layout.addWidget(scroll_area)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.cancel_button = QPushButton("Cancel All")
+        self.cancel_button.clicked.connect(self.request_abort)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+
+        self.setLayout(layout)
+
+        self.queue.job_changed.connect(self.update_job)
+        self.queue.all_finished.connect(self.on_all_finished)
+        for job in queue.jobs:
+            self.update_job(job.index)
+
+    def update_job(self, index):
+        job = self.queue.jobs[index]
+        job_bar, job_status, cancel_button = self.rows[index]
+        job_bar.setValue(int(job.fraction * 1000))
+        text = job.status if len(job.status) <= 80 else job.status[:77] + "..."
+        job_status.setText(text)
+        cancel_button.setEnabled(not job.is_finished() and not job.cancelled)
+
+        finished = sum(1 for job in self.queue.jobs if job.is_finished())
+        self.status_label.setText(f"{finished} of {len(self.queue.jobs)} versions finished")
+        self.progress_bar.setValue(int(self.queue.aggregate() * 1000))
+
+    def on_all_finished(self):
+        self.cancel_button.setText("Close")
+        self.cancel_button.setEnabled(True)
+        failed = [job for job in self.queue.jobs if job.state != "done"]
+        if not failed:
+            self.status_label.setText("All versions prepared successfully!")
+            QTimer.singleShot(1500, self.accept)
+        else:
+            self.status_label.setText(f"{len(failed)} of {len(self.queue.jobs)} versions were not prepared.")
+
+    def request_abort(self):
+        if self.queue.is_running() or any(job.state == "queued" for job in self.queue.jobs):
+            self.status_label.setText("Aborting...")
+            self.cancel_button.setEnabled(False)
+            self.queue.cancel_all()
+        else:
+            super().reject()
+
+    def reject(self):
+        self.request_abort()
+
+    def closeEvent(self, event):
+        if self.queue.is_running():
+            event.ignore()
+            self.request_abort()
+        else:
+            event.accept()
+
+
+class SpeculativePrepare(QObject):
+    """Idle time check of the version the user most likely plays next.
+
+    A low priority thread checks its files against the integrity manifest,
+    asks the OS to cache the jar and libraries and downloads whatever is
+    missing, so the Play click that follows has little left to do. It stops
+    between files or downloads once cancel() is called."""
+
+    finished = pyqtSignal(str, bool)
+    log_update = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.version = None
+        self.log_dir = None
+        self.token = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.start)
+
+    def schedule(self, version, log_dir=None, delay=SPECULATIVE_DELAY):
+        self.cancel()
+        self.version = version
+        self.log_dir = log_dir
+        self.timer.start(int(delay * 1000))
+
+    def cancel(self):
+        # A running check sees its token replaced and stops
+        self.timer.stop()
+        self.token = None
+
+    def is_active(self, version=None):
+        active = self.timer.isActive() or self.token is not None
+        return active and (version is None or version == self.version)
+
+    def start(self):
+        token = object()
+        self.token = token
+        thread = threading.Thread(target=self._run, args=(self.version, self.log_dir, token), daemon=True)
+        thread.start()
+
+    def _run(self, version, log_dir, token):
+        cancelled = lambda: self.token is not token
+        if sys.platform.startswith("linux"):
+            # Nice values are per thread on Linux, the UI keeps its priority
+            try:
+                os.nice(SPECULATIVE_NICE)
+            except OSError:
+                pass
+        ok = False
+        try:
+            result = integrity.check_version(version, cancelled=cancelled, prefetch=True)
+            print(f"Background check of {result.summary()}")
+            ok = result.ok or self._prepare(version, log_dir, cancelled)
+        except InterruptedError:
+            print(f"Background check of {version} cancelled")
+        except (Exception, SystemExit) as e:
+            print(f"Error in background check of {version}: {e}")
+        if not cancelled():
+            self.token = None
+            self.finished.emit(version, ok)
+
+    def _prepare(self, version, log_dir, cancelled):
+        session = sessionlog.open_session_log(log_dir, f"prepare-{version}")
+        stdout_capture = StreamingCapture(self.log_update, None, session=session)
+        stderr_capture = StreamingCapture(self.log_update, None, session=session)
+        try:
+            with modulecli.progress_sink(lambda event: None, cancelled):
+                exit_code = modulecli.engine.run(f"version prepare {version}", stdout_capture, stderr_capture,
+                                                 standalone_mode=False)
+            if exit_code != 0 or cancelled():
+                return False
+            record_integrity(version, self.log_update.emit)
+            return True
+        finally:
+            stdout_capture.flush_status()
+            stderr_capture.flush_status()
+            if session is not None:
+                session.close()
+
+def session_log_dir(instance_name):
+    # Launch and prepare logs are kept in the instance folder
+    try:
+        return os.path.join(modulecli.instance_dir(instance_name), sessionlog.LOG_FOLDER)
+    except Exception as e:
+        print(f"Error finding the log folder: {e}")
+        return None
+
+
+def record_integrity(version, emit):
+    # Hash a freshly prepared version now, its first launch is then stat calls only
+    try:
+        emit("Recording game file hashes...")
+        emit(integrity.check_version(version).summary())
+    except (Exception, SystemExit) as e:
+        print(f"Error recording game file hashes of {version}: {e}")
+
+def launch_instance_with_window(command, parent=None, in_subprocess=False, log_dir=None, timer=None,
+                                version=None, verify="auto", plan_request=None, jvm_profile=None,
+                                class_data_sharing=False, monitor=None):
+    """verify is "auto" to check the files against the integrity manifest,
+    True for a full verify or False to leave it to zucaro. plan_request
+    holds the launchplan.plan_key arguments of a launch that may use a
+    cached launch plan once its files checked out. jvm_profile is an
+    (instance, profile, ram, version, java, manage_java) tuple for
+    jvmprofiles.apply_profile.
+    class_data_sharing adds an AppCDS archive to launches from a plan.
+    monitor is called with the gamemonitor summary of the session once
+    the game exits, the game is only sampled when it is given."""
     window = LaunchWindow(parent)
-    window.launch_game(command)
+    window.session_log = sessionlog.open_session_log(log_dir, "launch")
+    window.launch_timer = timer
+    window.in_subprocess = in_subprocess
+    window.plan_request = plan_request
+    window.jvm_profile = jvm_profile
+    window.class_data_sharing = class_data_sharing
+    window.monitor_callback = monitor
+    if version and verify:
+        window.check_and_launch(command, version, full_verify=verify is True)
+    elif verify is True:
+        window.on_integrity_checked(command + " --verify")
+    elif in_subprocess:
+        window.launch_game_process(command)
+    else:
+        window.launch_game(command)
     window.exec_()
     return window
 
-def prepare_version_with_window(version, parent=None):
+def prepare_version_with_window(version, parent=None, log_dir=None):
     window = PrepareWindow(parent)
+    window.session_log = sessionlog.open_session_log(log_dir, f"prepare-{version}")
     window.prepare_version(version)
     window.exec_()
     return window.success
+
+def prepare_versions_with_window(versions, parent=None, max_parallel=DEFAULT_PARALLEL_PREPARES, log_dir=None):
+    """Prepare several versions at once, returns {version: success}."""
+    queue = PrepareQueue(max_parallel, log_dir=log_dir)
+    for version in versions:
+        queue.add(version)
+    window = PrepareQueueWindow(queue, parent)
+    queue.start()
+    window.exec_()
+    return queue.results()
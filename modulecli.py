@@ -1,46 +1,1074 @@
 from io import StringIO
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
 import sys
 import shlex
 import gc
+import threading
+import time
+import json
+import bisect
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+
+# Records returned by the query helpers, so callers don't have to scrape
+# the text the CLI prints. `type` is the manifest type ("release",
+# "snapshot", "old_alpha", "old_beta") or None for local only versions.
+Version = namedtuple("Version", ["name", "type", "local"])
+Account = namedtuple("Account", ["name", "default"])
+Instance = namedtuple("Instance", ["name", "path"])
+
+# Download progress reported to progress_sink() callbacks. `unit` is "B"
+# when zucaro knows the download sizes (done/total are bytes) and "files"
+# otherwise. `eta` is in seconds, None until there is a rate to go by.
+ProgressEvent = namedtuple("ProgressEvent", ["phase", "done", "total", "unit", "bytes", "bytes_per_second", "eta"])
+
+# Seconds between two progress events of the same download
+PROGRESS_INTERVAL = 0.1
+
+# Seconds a read-only command stays cached, keyed by command name
+DEFAULT_CACHE_TTLS = {
+    "version list": 300,
+    "account list": 60,
+    "instance list": 60,
+    "instance dir": 600,
+}
+
+# Cached command names each write command makes stale. Anything that is
+# neither cacheable nor listed here drops the whole cache to be safe.
+INVALIDATED_BY = {
+    "account create": ["account list"],
+    "account remove": ["account list"],
+    "account setdefault": ["account list"],
+    "account authenticate": ["account list"],
+    "account refresh": [],
+    "instance create": ["instance list", "instance dir"],
+    "instance rename": ["instance list", "instance dir"],
+    "instance delete": ["instance list", "instance dir"],
+    "instance launch": ["version list"],
+    "version prepare": ["version list"],
+    "mod loader": ["version list"],
+}
+
+# Seconds an async call may take before its future fails, keyed by command
+# name. Creating a Microsoft account waits on the user to log in.
+DEFAULT_COMMAND_TIMEOUT = 60
+COMMAND_TIMEOUTS = {
+    "account create": 300,
+    "account authenticate": 300,
+    "version prepare": 1800,
+    "mod loader": 1800,
+}
+
+# Threads used by the *_async helpers
+ASYNC_WORKERS = 4
+
+# Phases a command's wall time is split into. "purge" is resetting the
+# state zucaro keeps between calls (or dropping its modules on reload),
+# "gc" is releasing the launcher and garbage collecting after a reload.
+LATENCY_PHASES = ("purge", "import", "exec", "capture", "gc")
+
+# Upper bounds in milliseconds of the latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 30000)
+
+_MISSING = object()
+
+
+def command_name(command):
+    # First two words, e.g. "version list" or "mod loader"
+    return " ".join(shlex.split(command)[:2])
+
+
+def normalize_command(command):
+    # Flags are order independent, "--snapshot --release" and
+    # "--release --snapshot" share a cache entry. Kept as parsed arguments,
+    # joined back they would lose their quoting.
+    args = shlex.split(command)
+    positional = [arg for arg in args if not arg.startswith("-")]
+    flags = sorted(arg for arg in args if arg.startswith("-"))
+    return tuple(positional + flags)
+
+
+class QueryCache:
+    """TTL cache for read-only zucaro commands and typed queries.
+
+    Entries are keyed by (kind, normalized command) so a text result and
+    a typed result of the same command are cached separately but are
+    invalidated together."""
+
+    def __init__(self, ttls=None):
+        self.lock = threading.Lock()
+        self.ttls = dict(DEFAULT_CACHE_TTLS if ttls is None else ttls)
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def ttl_for(self, command):
+        return self.ttls.get(command_name(command))
+
+    def is_cacheable(self, command):
+        return bool(self.ttl_for(command))
+
+    def get(self, kind, command):
+        key = (kind, normalize_command(command))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return _MISSING
+
+    def put(self, kind, command, value):
+        ttl = self.ttl_for(command)
+        # None is what a failed command returns, the next call tries again
+        if not ttl or value is None:
+            return
+        key = (kind, normalize_command(command))
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, *names):
+        with self.lock:
+            stale = [key for key in self.entries if " ".join(key[1][:2]) in names]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+
+    def invalidate_for(self, command):
+        # Called after a command ran, drops whatever it may have changed
+        if self.is_cacheable(command):
+            return
+        names = INVALIDATED_BY.get(command_name(command))
+        if names is None:
+            self.clear()
+        elif names:
+            self.invalidate(*names)
+
+    def clear(self):
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+
+    def set_ttl(self, name, seconds):
+        with self.lock:
+            if seconds:
+                self.ttls[name] = seconds
+            else:
+                self.ttls.pop(name, None)
+        self.invalidate(name)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "entries": len(self.entries),
+                "invalidations": self.invalidations,
+            }
+
+
+class PhaseTimer:
+    """Splits a command's wall time into LATENCY_PHASES.
+
+    mark(phase) books the time since the previous mark on `phase`."""
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.phases = dict.fromkeys(LATENCY_PHASES, 0.0)
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] += now - self.last
+        self.last = now
+
+    def total(self):
+        return self.last - self.start
+
+
+class LatencyStats:
+    """Per command name latency histograms, optionally traced to a file."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands = {}
+        self.trace_path = None
+
+    def set_trace_file(self, path):
+        # JSON lines, one record per command. None or "" turns tracing off
+        with self.lock:
+            self.trace_path = path or None
+
+    def record(self, command, timer):
+        name = command_name(command)
+        total_ms = timer.total() * 1000
+        phases_ms = {phase: seconds * 1000 for phase, seconds in timer.phases.items()}
+        with self.lock:
+            entry = self.commands.get(name)
+            if entry is None:
+                entry = {
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "phases_ms": dict.fromkeys(LATENCY_PHASES, 0.0),
+                    "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+                self.commands[name] = entry
+            entry["count"] += 1
+            entry["total_ms"] += total_ms
+            entry["max_ms"] = max(entry["max_ms"], total_ms)
+            for phase, ms in phases_ms.items():
+                entry["phases_ms"][phase] += ms
+            entry["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+            trace_path = self.trace_path
+
+        if trace_path:
+            record = {"time": time.time(), "command": command, "name": name, "total_ms": round(total_ms, 3)}
+            record.update({phase: round(ms, 3) for phase, ms in phases_ms.items()})
+            try:
+                with open(trace_path, "a") as trace_file:
+                    trace_file.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"Error writing zucaro trace: {e}", file=sys.stderr)
+
+    def stats(self):
+        with self.lock:
+            result = {}
+            for name, entry in self.commands.items():
+                count = entry["count"]
+                result[name] = {
+                    "count": count,
+                    "mean_ms": entry["total_ms"] / count,
+                    "max_ms": entry["max_ms"],
+                    "phases_mean_ms": {phase: ms / count for phase, ms in entry["phases_ms"].items()},
+                    "histogram": dict(zip(LATENCY_BUCKETS_MS + (None,), entry["buckets"])),
+                }
+            return result
+
+    def clear(self):
+        with self.lock:
+            self.commands.clear()
+
+
+class StreamRouter:
+    """Installed once as sys.stdout / sys.stderr.
+
+    Writes go to the stream captured by the current context (thread), or
+    to the original stream when nothing is being captured. This lets
+    several zucaro commands run at the same time without stealing each
+    other's output, unlike swapping the process-wide sys.stdout.
+    coloredlogs resolves sys.stderr on every record, so zucaro's log
+    messages follow the same routing."""
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.targets = ContextVar(f"stream_router_{id(self)}", default=())
+
+    def current(self):
+        targets = self.targets.get()
+        return targets[-1] if targets else self.fallback
+
+    def push(self, stream):
+        return self.targets.set(self.targets.get() + (stream,))
+
+    def pop(self, token):
+        self.targets.reset(token)
+
+    def write(self, text):
+        return self.current().write(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        target = self.current()
+        if hasattr(target, "flush"):
+            target.flush()
+
+    def isatty(self):
+        # Captured output must never get terminal colors
+        if self.targets.get():
+            return False
+        return self.fallback.isatty()
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+
+_router_lock = threading.Lock()
+
+
+def install_stream_router():
+    with _router_lock:
+        if not isinstance(sys.stdout, StreamRouter):
+            sys.stdout = StreamRouter(sys.stdout)
+        if not isinstance(sys.stderr, StreamRouter):
+            sys.stderr = StreamRouter(sys.stderr)
+        return sys.stdout, sys.stderr
+
+
+@contextmanager
+def capture_output(stdout, stderr=None):
+    """Route this context's stdout/stderr writes to the given streams.
+
+    Other threads keep writing wherever they were writing before."""
+    out_router, err_router = install_stream_router()
+    out_token = out_router.push(stdout)
+    err_token = err_router.push(stderr if stderr is not None else stdout)
+    try:
+        yield stdout, stderr
+    finally:
+        err_router.pop(err_token)
+        out_router.pop(out_token)
+
+
+_progress_sink = ContextVar("zucaro_progress_sink", default=None)
+_progress_phase = ContextVar("zucaro_progress_phase", default=None)
+
+
+@contextmanager
+def progress_sink(callback, cancelled=None):
+    """Send download progress of commands run in this context to
+    callback(ProgressEvent). The callback is called from zucaro's
+    download threads. Once cancelled() is true the running downloads
+    stop with InterruptedError."""
+    token = _progress_sink.set((callback, cancelled))
+    try:
+        yield
+    finally:
+        _progress_sink.reset(token)
+
+
+class ProgressBar:
+    """Stands in for the tqdm bar of zucaro's Downloader.
+
+    Bound to the sink of the context that created it, updates come from
+    the download threads and are turned into throttled ProgressEvents."""
+
+    def __init__(self, sink, phase, total, unit, cancelled=None):
+        self.sink = sink
+        self.cancelled = cancelled
+        self.phase = phase
+        self.total = total or 0
+        self.unit = unit
+        self.done = 0
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.last_emit = 0.0
+        self.closed = False
+
+    def __enter__(self):
+        self.emit(force=True)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def update(self, n=1):
+        if self.cancelled is not None and self.cancelled():
+            raise InterruptedError("Download cancelled")
+        with self.lock:
+            self.done += n
+        self.emit()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.emit(force=True)
+
+    def emit(self, force=False):
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.last_emit < PROGRESS_INTERVAL:
+                return
+            self.last_emit = now
+            elapsed = now - self.started
+            rate = self.done / elapsed if elapsed > 0 else 0.0
+            eta = (self.total - self.done) / rate if rate > 0 and self.total else None
+            is_bytes = self.unit == "B"
+            event = ProgressEvent(self.phase, self.done, self.total, self.unit,
+                                  self.done if is_bytes else 0, rate if is_bytes else 0.0, eta)
+        try:
+            self.sink(event)
+        except Exception as e:
+            print(f"Error reporting progress: {e}", file=sys.stderr)
+
+
+def _install_progress_hooks():
+    # zucaro draws tqdm bars on stderr, swap them for ProgressBar when a
+    # progress sink is set and tag downloads with the phase they belong to
+    try:
+        import zucaro.downloader as downloader
+        from zucaro.version import Version
+    except ImportError:
+        return
+    real_tqdm = downloader.tqdm
+    if getattr(real_tqdm, "_picodulce_hook", False):
+        return
+
+    def progress_bar(*args, **kwargs):
+        sink = _progress_sink.get()
+        if sink is None:
+            return real_tqdm(*args, **kwargs)
+        callback, cancelled = sink
+        unit = "B" if kwargs.get("unit") == "iB" else "files"
+        return ProgressBar(callback, _progress_phase.get() or "files", kwargs.get("total"), unit, cancelled)
+
+    progress_bar._picodulce_hook = True
+    downloader.tqdm = progress_bar
+
+    def with_phase(method, phase):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            sink = _progress_sink.get()
+            if sink is not None:
+                # Start of the phase, nothing is known about its size yet
+                sink[0](ProgressEvent(phase, 0, 0, "files", 0, 0.0, None))
+            token = _progress_phase.set(phase)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _progress_phase.reset(token)
+        return wrapper
+
+    Version.download_libraries = with_phase(Version.download_libraries, "libraries")
+    Version.download_assets = with_phase(Version.download_assets, "assets")
+
+
+# Destination path -> Event set once the download of that file finished
+_inflight_downloads = {}
+_inflight_lock = threading.Lock()
+
+
+def _install_shared_downloads():
+    # Versions prepared at the same time need many of the same libraries and
+    # assets. A file already being downloaded by another command is waited
+    # for instead of being fetched a second time.
+    try:
+        from zucaro.downloader import Downloader
+    except ImportError:
+        return
+    download_file = Downloader.download_file
+    if getattr(download_file, "_picodulce_hook", False):
+        return
+
+    @functools.wraps(download_file)
+    def shared_download_file(self, i, url, dest, sz_callback):
+        key = os.path.abspath(dest)
+        with _inflight_lock:
+            event = _inflight_downloads.get(key)
+            owner = event is None
+            if owner:
+                event = _inflight_downloads[key] = threading.Event()
+
+        if not owner:
+            event.wait()
+            if os.path.isfile(key) and os.path.getsize(key) > 0:
+                # Count the bytes as if this command downloaded them
+                sz_callback(os.path.getsize(key))
+                return
+            # The other download failed, try again ourselves
+            return shared_download_file(self, i, url, dest, sz_callback)
+
+        try:
+            return download_file(self, i, url, dest, sz_callback)
+        finally:
+            with _inflight_lock:
+                _inflight_downloads.pop(key, None)
+            event.set()
+
+    shared_download_file._picodulce_hook = True
+    Downloader.download_file = shared_download_file
+
+
+class _ThreadLocalArtifacts:
+    """Per thread replacement for zucaro's Library._loaded_artifacts.
+
+    The class level dict de-duplicates libraries for one version, sharing
+    it between concurrent commands would hide libraries from each other."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def _data(self):
+        if not hasattr(self.local, "data"):
+            self.local.data = {}
+        return self.local.data
+
+    def get(self, key, default=None):
+        return self._data().get(key, default)
+
+    def __getitem__(self, key):
+        return self._data()[key]
+
+    def __setitem__(self, key, value):
+        self._data()[key] = value
+
+    def __contains__(self, key):
+        return key in self._data()
+
+    def clear(self):
+        self._data().clear()
+
+
+class CommandEngine:
+    """Keeps zucaro imported and a launcher open between commands.
+
+    The old approach purged every zucaro module from sys.modules and
+    re-imported it for each call, which costs hundreds of milliseconds.
+    The engine imports zucaro once and only resets the bits of state that
+    zucaro keeps at module or class level between invocations."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.cli = None
+        self.launcher_cm = None
+        self.launcher = None
+
+    def load(self):
+        with self.lock:
+            if self.cli is None:
+                from zucaro.cli.main import zucaro_cli
+                try:
+                    from zucaro.library import Library
+                    Library._loaded_artifacts = _ThreadLocalArtifacts()
+                except (ImportError, AttributeError):
+                    pass
+                _install_progress_hooks()
+                _install_shared_downloads()
+                self.cli = zucaro_cli
+            return self.cli
+
+    def get_launcher(self):
+        # Long-lived launcher used by the query helpers, commands run through
+        # click still build their own from the CLI group callback
+        with self.lock:
+            if self.launcher is None:
+                self.load()
+                from zucaro.launcher import Launcher
+                self.launcher_cm = Launcher.new()
+                self.launcher = self.launcher_cm.__enter__()
+            return self.launcher
+
+    @contextmanager
+    def session(self):
+        with self.lock:
+            yield self.get_launcher()
+
+    def close_launcher(self):
+        # Commits any dirty zucaro config and drops the cached managers so
+        # the next query re-reads accounts.json and friends from disk
+        with self.lock:
+            if self.launcher_cm is not None:
+                try:
+                    self.launcher_cm.__exit__(None, None, None)
+                except Exception as e:
+                    print(f"Error closing zucaro launcher: {e}", file=sys.stderr)
+            self.launcher_cm = None
+            self.launcher = None
+
+    def reset_state(self):
+        # Library de-duplicates artifacts through a class level dict, if it is
+        # not cleared the libraries of one version leak into the next one.
+        # load() made it per thread so this only touches the caller's table.
+        try:
+            from zucaro.library import Library
+            Library._loaded_artifacts.clear()
+        except (ImportError, AttributeError):
+            pass
+
+    def reload(self):
+        # Full purge, only needed when zucaro itself was upgraded on disk
+        with self.lock:
+            timer = PhaseTimer()
+            self.close_launcher()
+            self.cli = None
+            modules_to_remove = [mod for mod in sys.modules if mod.startswith('zucaro')]
+            for mod in modules_to_remove:
+                del sys.modules[mod]
+            timer.mark("purge")
+            gc.collect()
+            timer.mark("gc")
+            latency.record("engine reload", timer)
+
+    def run(self, command, stdout, stderr, standalone_mode=True):
+        # The lock is not held while the command runs, a launch blocks until
+        # the game exits and the UI still needs to query zucaro meanwhile.
+        # Output is captured per context so concurrent commands don't mix.
+        # Returns the exit code of the command, 0 when it succeeded
+        exit_code = 0
+        timer = PhaseTimer()
+        with self.lock:
+            zucaro_cli = self.load()
+        timer.mark("import")
+        self.reset_state()
+        timer.mark("purge")
+
+        try:
+            with capture_output(stdout, stderr):
+                timer.mark("capture")
+                try:
+                    # Use shlex.split to properly parse the command string
+                    # This will call Click's CLI as if from command line, using args
+                    zucaro_cli.main(args=shlex.split(command), standalone_mode=standalone_mode)
+                except SystemExit as e:
+                    if e.code != 0:
+                        exit_code = e.code if isinstance(e.code, int) else 1
+                        print(f"Command exited with code {e.code}", file=sys.stderr)
+                finally:
+                    timer.mark("exec")
+            timer.mark("capture")
+        finally:
+            # The command may have changed files the warm launcher has cached
+            self.close_launcher()
+            cache.invalidate_for(command)
+            timer.mark("gc")
+            latency.record(command, timer)
+        return exit_code
+
+    def run_batch(self, items):
+        """Run commands and queries back to back in one session.
+
+        Every command is dispatched to its click subcommand with the warm
+        launcher as context object, so the group callback (logging setup
+        and a fresh Launcher) runs once per batch instead of once per
+        command. Commands return their stdout like run_command, callables
+        are called as is and usually are query helpers."""
+        results = []
+        with self.session():
+            zucaro_cli = self.load()
+            from zucaro import logging as zucaro_logging
+            zucaro_logging.initialize(False)
+            try:
+                for item in items:
+                    if callable(item):
+                        results.append(item())
+                        continue
+                    cached = cache.get("text", item) if cache.is_cacheable(item) else _MISSING
+                    if cached is not _MISSING:
+                        results.append(cached)
+                        continue
+                    timer = PhaseTimer()
+                    output = self._invoke(zucaro_cli, self.get_launcher(), item, timer)
+                    if not cache.is_cacheable(item):
+                        # zucaro only saves configs when the launcher closes,
+                        # commit now so later items see what this one did
+                        self.close_launcher()
+                    # Later items of the batch must not see stale results
+                    cache.invalidate_for(item)
+                    timer.mark("gc")
+                    latency.record(item, timer)
+                    cache.put("text", item, output)
+                    results.append(output)
+            finally:
+                self.close_launcher()
+        return results
+
+    def _invoke(self, zucaro_cli, launcher, command, timer):
+        import click
+        timer.mark("import")
+        self.reset_state()
+        timer.mark("purge")
+        stdout = StringIO()
+        stderr = StringIO()
+        with capture_output(stdout, stderr):
+            timer.mark("capture")
+            try:
+                args = shlex.split(command)
+                # Global options belong to the group callback we skip here
+                if args and args[0].startswith("-"):
+                    raise click.UsageError("Global options are not supported in a batch")
+                with click.Context(zucaro_cli, info_name="zucaro", obj=launcher) as ctx:
+                    name, cmd, rest = zucaro_cli.resolve_command(ctx, args)
+                    with cmd.make_context(name, rest, parent=ctx) as sub_ctx:
+                        cmd.invoke(sub_ctx)
+            except click.ClickException as e:
+                e.show()
+            except (click.exceptions.Exit, click.exceptions.Abort, SystemExit) as e:
+                code = getattr(e, "exit_code", getattr(e, "code", 1))
+                if code:
+                    print(f"Command exited with code {code}", file=sys.stderr)
+            except Exception as e:
+                print(f"Unexpected error: {e}", file=sys.stderr)
+            timer.mark("exec")
+        output = stdout.getvalue().strip() or None
+        timer.mark("capture")
+        return output
+
+
+engine = CommandEngine()
+cache = QueryCache()
+latency = LatencyStats()
+
+# Set by start_worker_pool(), commands then run in separate processes
+_worker_pool = None
+
+
+def start_worker_pool(size):
+    """Run zucaro commands in `size` pre-spawned worker processes.
+
+    Keeps the GUI process alive if zucaro crashes or leaks. Launches and
+    prepares done by loaddaemon still use the in-process engine since they
+    stream their output."""
+    global _worker_pool
+    if _worker_pool is None and size > 0:
+        import moduleworker
+        _worker_pool = moduleworker.start_pool(size, read_only=cache.is_cacheable, timeout_for=timeout_for)
+    return _worker_pool
+
+
+def stop_worker_pool():
+    global _worker_pool
+    if _worker_pool is not None:
+        _worker_pool.stop()
+        _worker_pool = None
+
+
+def worker_stats():
+    if _worker_pool is None:
+        return []
+    return _worker_pool.stats()
+
 
 def run_command(command="zucaro"):
-    # Remove all zucaro-related modules from sys.modules BEFORE import
-    modules_to_remove = [mod for mod in sys.modules if mod.startswith('zucaro')]
-    for mod in modules_to_remove:
-        del sys.modules[mod]
-    gc.collect()
-
-    # Import zucaro_cli dynamically
-    from zucaro.cli.main import zucaro_cli
-
-    # Redirect stdout and stderr to capture the command output
-    old_stdout, old_stderr = sys.stdout, sys.stderr
-    sys.stdout = mystdout = StringIO()
-    sys.stderr = mystderr = StringIO()
-    
+    cached = cache.get("text", command) if cache.is_cacheable(command) else _MISSING
+    if cached is not _MISSING:
+        return cached
+
+    if _worker_pool is not None:
+        # The phases happen in the worker, here it is all one round trip
+        timer = PhaseTimer()
+        try:
+            output = _worker_pool.run_command(command)
+        except Exception as e:
+            print(f"Unexpected error: {e}", file=sys.stderr)
+            output = None
+        finally:
+            # The worker's engine can't reach this process' cache
+            cache.invalidate_for(command)
+            timer.mark("exec")
+            latency.record(command, timer)
+        cache.put("text", command, output)
+        return output
+
+    mystdout = StringIO()
+    mystderr = StringIO()
+
+    exit_code = 1
     try:
-        # Use shlex.split to properly parse the command string
-        # This will call Click's CLI as if from command line, using args
-        zucaro_cli.main(args=shlex.split(command))
-    except SystemExit as e:
-        if e.code != 0:
-            print(f"Command exited with code {e.code}", file=sys.stderr)
+        exit_code = engine.run(command, mystdout, mystderr)
     except Exception as e:
-        print(f"Unexpected error: {e}", file=sys.stderr)
-    finally:
-        # Restore stdout and stderr
-        sys.stdout = old_stdout
-        sys.stderr = old_stderr
-
-    output = mystdout.getvalue().strip()
-    mystderr.getvalue().strip()
-
-    # Cleanup: remove zucaro-related modules from sys.modules and force garbage collection
-    modules_to_remove = [mod for mod in sys.modules if mod.startswith('zucaro')]
-    for mod in modules_to_remove:
-        del sys.modules[mod]
-    gc.collect()
-    
-    if not output:
-        return None
+        print(f"Unexpected error: {e}", file=mystderr)
+
+    output = mystdout.getvalue().strip() or None
+    if exit_code == 0:
+        cache.put("text", command, output)
     return output
+
+
+def run_batch(items):
+    """Run several commands (and query callables) touching zucaro once.
+
+    Returns the results in order, commands give their output like
+    run_command does. Useful at startup where a few commands always run
+    back to back."""
+    items = list(items)
+    if _worker_pool is None:
+        return engine.run_batch(items)
+
+    # Consecutive commands go to a worker as one batch, queries route
+    # themselves through the pool
+    results = []
+    pending = []
+
+    def flush():
+        if not pending:
+            return
+        try:
+            results.extend(_worker_pool.run_batch(pending))
+        except Exception as e:
+            print(f"Unexpected error: {e}", file=sys.stderr)
+            results.extend([None] * len(pending))
+        for command in pending:
+            cache.invalidate_for(command)
+        pending.clear()
+
+    for item in items:
+        if callable(item):
+            flush()
+            results.append(item())
+        else:
+            pending.append(item)
+    flush()
+    return results
+
+
+def reload_engine():
+    engine.reload()
+    cache.clear()
+
+
+def invalidate(*names):
+    """Drop cached results for the given command names, for changes made
+    behind zucaro's back (e.g. authser writing accounts.json)."""
+    cache.invalidate(*names)
+
+
+def set_cache_ttl(name, seconds):
+    # A falsy TTL disables caching for that command
+    cache.set_ttl(name, seconds)
+
+
+def set_trace_file(path):
+    latency.set_trace_file(path)
+
+
+def latency_stats():
+    """Latency per command name: count, mean/max and per phase means in
+    milliseconds, and the histogram keyed by bucket upper bound."""
+    return latency.stats()
+
+
+def format_latency_stats():
+    # Plain text table for the Stats for Nerds dialog
+    stats = latency_stats()
+    if not stats:
+        return "No zucaro commands recorded yet."
+    lines = []
+    for name, entry in sorted(stats.items(), key=lambda item: -item[1]["mean_ms"] * item[1]["count"]):
+        phases = " ".join(f"{phase} {ms:.1f}" for phase, ms in entry["phases_mean_ms"].items())
+        buckets = " ".join(
+            f"{'<=' + str(bound) if bound is not None else '>' + str(LATENCY_BUCKETS_MS[-1])}ms:{count}"
+            for bound, count in entry["histogram"].items() if count)
+        lines.append(f"{name}: {entry['count']} calls, mean {entry['mean_ms']:.1f} ms, max {entry['max_ms']:.1f} ms")
+        lines.append(f"    phases (mean ms): {phases}")
+        lines.append(f"    histogram: {buckets}")
+    return "\n".join(lines)
+
+
+def cache_stats():
+    return cache.stats()
+
+
+def _cached_query(command, name, *args):
+    if not cache.is_cacheable(command):
+        return _timed_query(command, name, args)
+    value = cache.get("query", command)
+    if value is _MISSING:
+        value = _timed_query(command, name, args)
+        cache.put("query", command, value)
+    # Hand out copies, callers are free to reorder their lists
+    return list(value)
+
+
+def _timed_query(command, name, args):
+    # Queries skip click and output capture, all of it is execution
+    timer = PhaseTimer()
+    try:
+        return _run_query(name, args)
+    finally:
+        timer.mark("exec")
+        latency.record(command, timer)
+
+
+def _run_query(name, args):
+    if _worker_pool is None:
+        return run_query_locally(name, args)
+    # Records come back from the worker as plain JSON lists
+    record = _QUERIES[name][1]
+    rows = _worker_pool.query(name, args)
+    if record is None:
+        return rows
+    return [record(*row) for row in rows]
+
+
+def run_query_locally(name, args):
+    return _QUERIES[name][0](*args)
+
+
+def list_versions(release=False, snapshot=False, alpha=False, beta=False, local=None):
+    # Same rules as `version list`: without any type flags only the locally
+    # installed versions are listed
+    if local is None:
+        local = not (release or snapshot or alpha or beta)
+
+    flags = [name for name, enabled in (("--release", release), ("--snapshot", snapshot),
+             ("--alpha", alpha), ("--beta", beta), ("--local", local)) if enabled]
+    command = " ".join(["version list"] + flags)
+    return _cached_query(command, "list_versions", release, snapshot, alpha, beta, local)
+
+
+def _list_versions(release, snapshot, alpha, beta, local):
+    with engine.session() as launcher:
+        from zucaro.version import VersionType
+        vm = launcher.version_manager
+        wanted = VersionType.create(release, snapshot, alpha, beta)
+
+        versions = []
+        if wanted != VersionType.NONE:
+            for entry in vm.manifest["versions"]:
+                if wanted.match(entry["type"]):
+                    versions.append(Version(entry["id"], entry["type"], False))
+        if local:
+            local_names = sorted(
+                path.name for path in vm.versions_root.iterdir()
+                if not path.name.startswith(".") and path.is_dir()
+            )
+            versions.extend(Version(name, None, True) for name in local_names)
+    return versions
+
+
+def list_accounts():
+    return _cached_query("account list", "list_accounts")
+
+
+def _list_accounts():
+    with engine.session() as launcher:
+        am = launcher.account_manager
+        return [Account(name, am.is_default(name)) for name in am.list()]
+
+
+def get_default_account():
+    for account in list_accounts():
+        if account.default:
+            return account.name
+    return None
+
+
+def list_instances():
+    return _cached_query("instance list", "list_instances")
+
+
+def _list_instances():
+    with engine.session() as launcher:
+        im = launcher.instance_manager
+        return [Instance(name, str(im.get_root(name))) for name in im.list()]
+
+
+def instance_dir(instance_name=None):
+    # Without a name this is the instances root, like `instance dir`
+    command = "instance dir" if not instance_name else f"instance dir {shlex.quote(instance_name)}"
+    return _cached_query(command, "instance_dir", instance_name)[0]
+
+
+def _instance_dir(instance_name):
+    with engine.session() as launcher:
+        from zucaro.utils import Directory, sanitize_name
+        if not instance_name:
+            return [str(launcher.get_path(Directory.INSTANCES))]
+        return [str(launcher.instance_manager.get_root(sanitize_name(instance_name)))]
+
+
+# Query name -> (implementation, record type used to rebuild worker results)
+_QUERIES = {
+    "list_versions": (_list_versions, Version),
+    "list_accounts": (_list_accounts, Account),
+    "list_instances": (_list_instances, Instance),
+    "instance_dir": (_instance_dir, None),
+}
+
+
+class CommandFuture(QObject):
+    """Result of an async call, delivered on the thread that created it.
+
+    `finished` carries the return value and `failed` an error message.
+    Both fire at most once, after the current event loop turn, so
+    connecting right after the call never misses the result. Pending
+    futures are kept alive here, callers don't have to hold them."""
+
+    pending = set()
+
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    _resolved = pyqtSignal(bool, object)
+
+    def __init__(self, timeout=None):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.done = False
+        self.ok = False
+        self.value = None
+        self._resolved.connect(self._deliver)
+        if timeout:
+            QTimer.singleShot(int(timeout * 1000), self._on_timeout)
+
+    def resolve(self, ok, value):
+        # Called from the pool thread, the first outcome wins
+        with self.lock:
+            if self.done:
+                return
+            self.done = True
+            self.ok = ok
+            self.value = value
+        self._resolved.emit(ok, value)
+
+    @pyqtSlot(bool, object)
+    def _deliver(self, ok, value):
+        try:
+            if ok:
+                self.finished.emit(value)
+            else:
+                self.failed.emit(value)
+        finally:
+            CommandFuture.pending.discard(self)
+
+    @pyqtSlot()
+    def _on_timeout(self):
+        self.resolve(False, "Timed out")
+
+    def then(self, callback, errback=None):
+        self.finished.connect(callback)
+        if errback is not None:
+            self.failed.connect(errback)
+        return self
+
+
+_async_executor = None
+_async_lock = threading.Lock()
+
+
+def _get_executor():
+    global _async_executor
+    with _async_lock:
+        if _async_executor is None:
+            _async_executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="zucaro-async")
+        return _async_executor
+
+
+def timeout_for(command):
+    return COMMAND_TIMEOUTS.get(command_name(command), DEFAULT_COMMAND_TIMEOUT)
+
+
+def call_async(func, *args, timeout=DEFAULT_COMMAND_TIMEOUT):
+    """Run func(*args) on the bounded pool and return a CommandFuture.
+
+    Must be called from a thread with a Qt event loop. A timed out call
+    keeps its pool thread until zucaro returns, its result is dropped."""
+    future = CommandFuture(timeout)
+    # Parentless, without a reference it could be collected before the
+    # queued result arrives and the callbacks would never run
+    CommandFuture.pending.add(future)
+
+    def task():
+        try:
+            result = func(*args)
+        except Exception as e:
+            future.resolve(False, str(e) or e.__class__.__name__)
+        else:
+            future.resolve(True, result)
+
+    _get_executor().submit(task)
+    return future
+
+
+def run_command_async(command="zucaro", timeout=None):
+    return call_async(run_command, command, timeout=timeout or timeout_for(command))
@@ -0,0 +1,233 @@
+"""Out-of-process zucaro workers.
+
+Each worker is this script started with the launcher's interpreter. It
+reads one JSON-RPC request per line on stdin and answers with one JSON
+line on its original stdout:
+
+    {"id": 1, "method": "run_command", "params": {"command": "instance list"}}
+    {"id": 1, "result": "default"}
+
+Errors are returned as {"id": 1, "error": "message"}. Everything zucaro
+(or the game it spawns) prints ends up on the worker's stderr so it can
+never corrupt the protocol stream.
+"""
+import os
+import sys
+import json
+import atexit
+import threading
+import subprocess
+from concurrent.futures import Future
+
+WORKER_SCRIPT = os.path.abspath(__file__)
+
+# How long a caller waits for a worker answer before giving up, unless
+# the pool's timeout_for has a value for the command
+DEFAULT_TIMEOUT = 120
+
+
+class WorkerError(Exception):
+    pass
+
+
+class WorkerProcess:
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.reader = None
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.next_id = 1
+        self.restarts = 0
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        self.reader = threading.Thread(target=self._read_responses, args=(self.process,), daemon=True)
+        self.reader.start()
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def in_flight(self):
+        return len(self.pending)
+
+    def _read_responses(self, process):
+        for line in process.stdout:
+            try:
+                response = json.loads(line)
+            except ValueError:
+                continue
+            future = self.pending.pop(response.get("id"), None)
+            if future is None:
+                continue
+            if "error" in response:
+                future.set_exception(WorkerError(response["error"]))
+            else:
+                future.set_result(response.get("result"))
+
+        # The worker died, fail whatever was still waiting on it and bring
+        # up a fresh one unless it was stopped on purpose
+        process.wait()
+        with self.lock:
+            if process is not self.process:
+                return
+            pending, self.pending = self.pending, {}
+            self.restarts += 1
+            print(f"Restarting zucaro worker {self.index}", file=sys.stderr)
+            self.start()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(WorkerError(f"zucaro worker {self.index} exited"))
+        self.submit("warmup", {})
+
+    def submit(self, method, params):
+        with self.lock:
+            if not self.is_alive():
+                if self.process is not None:
+                    self.restarts += 1
+                    print(f"Restarting zucaro worker {self.index}", file=sys.stderr)
+                    stale, self.pending = self.pending, {}
+                    for future in stale.values():
+                        if not future.done():
+                            future.set_exception(WorkerError(f"zucaro worker {self.index} exited"))
+                self.start()
+            request_id = self.next_id
+            self.next_id += 1
+            future = Future()
+            self.pending[request_id] = future
+            try:
+                self.process.stdin.write(json.dumps({"id": request_id, "method": method, "params": params}) + "\n")
+                self.process.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                self.pending.pop(request_id, None)
+                future.set_exception(WorkerError(f"zucaro worker {self.index} is gone: {e}"))
+        return future
+
+    def stop(self):
+        with self.lock:
+            process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=5)
+        except Exception:
+            process.kill()
+
+
+class WorkerPool:
+    """Pre-spawned zucaro workers.
+
+    Read-only commands go to the least busy worker. Everything else goes to
+    the first worker, so zucaro's config files only ever have one writer.
+    timeout_for(command) gives the seconds a command may take."""
+
+    def __init__(self, size, read_only=None, timeout=DEFAULT_TIMEOUT, timeout_for=None):
+        self.workers = [WorkerProcess(index) for index in range(max(1, size))]
+        self.read_only = read_only or (lambda command: False)
+        self.timeout = timeout
+        self.timeout_for = timeout_for or (lambda command: timeout)
+
+    def start(self):
+        # Warm start, the first request of each worker imports zucaro
+        for worker in self.workers:
+            worker.start()
+            worker.submit("warmup", {})
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def pick(self, read_only):
+        if not read_only:
+            return self.workers[0]
+        return min(self.workers, key=lambda worker: worker.in_flight())
+
+    def call(self, method, params, read_only=False, timeout=None):
+        # A worker that crashed mid-request is restarted and the request is
+        # retried once, read-only requests only since writes may have happened
+        attempts = 2 if read_only else 1
+        for attempt in range(attempts):
+            worker = self.pick(read_only)
+            future = worker.submit(method, params)
+            try:
+                return future.result(timeout=timeout or self.timeout)
+            except WorkerError:
+                if attempt + 1 == attempts or worker.is_alive():
+                    raise
+
+    def run_command(self, command):
+        return self.call("run_command", {"command": command}, read_only=self.read_only(command),
+                         timeout=self.timeout_for(command))
+
+    def run_batch(self, commands):
+        read_only = all(self.read_only(command) for command in commands)
+        # The commands run one after the other in the worker
+        timeout = sum(self.timeout_for(command) for command in commands)
+        return self.call("run_batch", {"commands": list(commands)}, read_only=read_only, timeout=timeout)
+
+    def query(self, name, args):
+        return self.call("query", {"name": name, "args": list(args)}, read_only=True)
+
+    def stats(self):
+        return [
+            {"index": worker.index, "alive": worker.is_alive(), "restarts": worker.restarts,
+             "in_flight": worker.in_flight()}
+            for worker in self.workers
+        ]
+
+
+def start_pool(size, read_only=None, timeout_for=None):
+    pool = WorkerPool(size, read_only, timeout_for=timeout_for)
+    pool.start()
+    atexit.register(pool.stop)
+    return pool
+
+
+def serve():
+    # Keep the real stdout for responses, point fd 1 at stderr so output of
+    # zucaro and of the java child it spawns can't end up in the protocol
+    protocol = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    import modulecli
+
+    # The client process owns the cache, the worker always asks zucaro
+    modulecli.cache.ttls.clear()
+
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+        response = {"id": request.get("id")}
+        try:
+            response["result"] = handle(modulecli, request.get("method"), request.get("params") or {})
+        except Exception as e:
+            response["error"] = str(e) or e.__class__.__name__
+        protocol.write(json.dumps(response) + "\n")
+        protocol.flush()
+
+
+def handle(modulecli, method, params):
+    if method == "warmup":
+        modulecli.engine.load()
+        return True
+    if method == "run_command":
+        return modulecli.run_command(params["command"])
+    if method == "run_batch":
+        return modulecli.run_batch(params["commands"])
+    if method == "query":
+        return modulecli.run_query_locally(params["name"], params.get("args", []))
+    raise WorkerError(f"Unknown method: {method}")
+
+
+if __name__ == "__main__":
+    serve()
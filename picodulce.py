@@ -1,6 +1,5 @@
 import sys
 import subprocess
-import threading
 from threading import Thread
 import logging
 import re
@@ -15,6 +14,12 @@ from authser import MinecraftAuthenticator
 from healthcheck import HealthCheck
 import modulecli
 import loaddaemon
+import launchstats
+import jvmprofiles
+import gamemonitor
+import configstore
+import dirsize
+import startup
 
 from PyQt5.QtWidgets import QApplication, QComboBox, QWidget, QInputDialog, QVBoxLayout, QListWidget, QFileDialog, QPushButton, QMessageBox, QDialog, QHBoxLayout, QLabel, QLineEdit, QCheckBox, QTabWidget, QSpacerItem, QSizePolicy, QGridLayout, QTextEdit, QListWidgetItem, QMenu, QRadioButton, QProgressDialog, QShortcut, QKeySequenceEdit, QScrollArea
 from PyQt5.QtGui import QFont, QIcon, QColor, QPalette, QMovie, QPixmap, QDesktopServices, QKeySequence
@@ -93,49 +98,96 @@ class ThemeDownloadWorker(QThread):
             self.error.emit(str(e))
 
 class zucaroVersionSelector(QWidget):
-    def __init__(self):
+    def __init__(self, profile_startup=False):
         super().__init__()
         self.current_state = "menu"
         self.open_dialogs = []
 
         # Set up and use the health_check module
-        health_checker = HealthCheck()
-        health_checker.themes_integrity()
-        health_checker.check_config_file()
-        health_checker.zucaro_health_check()
-        self.config = health_checker.config
+        self.health_checker = HealthCheck()
+        self.installed_themes = None
+        # Created on the first authentication, zucaro is warm by then
+        self.authenticator = None
+        self.cached_themes = None
+        self.is_fetching_themes = False
 
+        # Easter egg state
+        self.rainbow_timer = None
+        self.rainbow_hue = 0
+
+        # Steps that don't depend on each other run at the same time and
+        # the window shows as soon as its widgets are built, the version
+        # list, update check and the rest fill in after
+        graph = startup.StartupGraph(self)
+        graph.add("themes_integrity", self.health_checker.themes_integrity)
+        graph.add("config", self.load_config, critical=True)
+        # Without zucaro there is nothing to list or launch, better said
+        # than an empty version list
+        graph.add("zucaro_warmup", self.warm_up_zucaro, after=["config"], critical=True)
+        graph.add("zucaro_health_check", self.health_checker.zucaro_health_check,
+                  after=["config", "zucaro_warmup"], gui=True)
+        graph.add("theme", self.load_startup_theme, after=["config", "themes_integrity"], gui=True)
+        graph.add("config_watcher", self.watch_config, after=["config", "themes_integrity"], gui=True)
+        graph.add("init_ui", self.init_ui, after=["theme"], gui=True, critical=True)
+        graph.add("show", self.show, after=["init_ui"], gui=True, critical=True)
+        graph.add("shortcuts", self.setup_shortcuts, after=["init_ui"], gui=True)
+        # Before the version list so it is served from the warmed cache
+        graph.add("first_launch", self.first_launch_if_needed, after=["zucaro_health_check"])
+        graph.add("installed_versions", self.populate_installed_versions, after=["init_ui", "first_launch"], gui=True)
+        graph.add("update_check", self.check_for_update_if_enabled, after=["init_ui"], gui=True)
+        graph.add("discord_rpc", self.start_discord_rcp_thread, after=["config"])
+        # Pre-fetch themes in background
+        graph.add("theme_prefetch", self.fetch_themes_async, after=["config"], gui=True)
+        graph.failed.connect(self.on_startup_failed)
+        if profile_startup:
+            graph.finished.connect(lambda: print(graph.report()))
+        self.startup = graph
+        graph.start()
+
+    def load_config(self):
+        self.health_checker.check_config_file()
+        # configstore.store, shared with the health check
+        self.config = self.health_checker.config
+
+        # Optional JSON lines trace of every zucaro command's timings
+        modulecli.set_trace_file(self.config.get("ZucaroTraceFile", ""))
+
+        # Warm up the out-of-process zucaro workers if enabled
+        worker_count = self.config.get("ZucaroWorkers", 0)
+        if worker_count > 0:
+            modulecli.start_worker_pool(worker_count)
+
+    def warm_up_zucaro(self):
+        # Imports zucaro and caches the instances folder the health check asks for
+        modulecli.instance_dir()
+
+    def load_startup_theme(self):
         themes_folder = "themes"
         theme_file = self.config.get("Theme", "Dark.json")
         theme_file_path = os.path.join(themes_folder, theme_file)
 
         # Load and apply primary theme
         self.load_theme_from_file(theme_file_path)
-        
-        self.init_ui()
 
-        if self.config.get("CheckUpdate", False):
-            self.check_for_update_start()
-
-        self.start_discord_rcp_thread()
+    def watch_config(self):
+        # Edits made to config.json or the themes while the launcher runs
+        self.config_watcher = configstore.ConfigWatcher(self.config, parent=self)
+        self.config_watcher.config_changed.connect(self.on_config_changed)
+        self.config_watcher.themes_changed.connect(self.on_themes_changed)
 
+    def first_launch_if_needed(self):
         if self.config.get("IsFirstLaunch", False):
             self.FirstLaunch()
 
-        self.authenticator = MinecraftAuthenticator(self)
-        self.authenticator.auth_finished.connect(self._on_auth_finished)
+    def check_for_update_if_enabled(self):
+        if self.config.get("CheckUpdate", False):
+            self.check_for_update_start()
 
-        # Set up keyboard shortcuts
-        self.setup_shortcuts()
-
-        # Pre-fetch themes in background
-        self.cached_themes = None
-        self.is_fetching_themes = False
-        self.fetch_themes_async()
-        
-        # Easter egg state
-        self.rainbow_timer = None
-        self.rainbow_hue = 0
+    def on_startup_failed(self, step):
+        error = (self.startup.steps[step].error or "").strip().splitlines()
+        reason = f":\n{error[-1]}" if error else ""
+        QMessageBox.critical(self, "Error", f"PicoDulce failed to start ({step}){reason}\n\nSee the console for details.")
+        QApplication.instance().exit(1)
 
 
     def load_theme_from_file(self, file_path, app=None):
@@ -208,12 +260,16 @@ class zucaroVersionSelector(QWidget):
 
     def FirstLaunch(self):
         try:
-            self.config_path = "config.json"
             print("Running zucaro instance create default command...")
             
-            # Run the command using modulecli
-            command = "instance create default"
-            result = modulecli.run_command(command)
+            # Create the default instance and warm the query cache for the
+            # version and account lists the UI asks for right after, all in
+            # one zucaro session
+            result, _, _ = modulecli.run_batch([
+                "instance create default",
+                modulecli.list_versions,
+                modulecli.list_accounts,
+            ])
             if not result:
                 print("Warning: modulecli returned empty response")
                 result = ""
@@ -223,11 +279,6 @@ class zucaroVersionSelector(QWidget):
             self.config["IsFirstLaunch"] = False
             print("IsFirstLaunch set to False")
 
-            # Save the updated config to the config.json file
-            with open(self.config_path, 'w') as f:
-                json.dump(self.config, f, indent=4)
-            print("Configuration saved to", self.config_path)
-
         except Exception as e:
             print("An error occurred while creating the instance.")
             print("Error output:", str(e))
@@ -319,7 +370,10 @@ class zucaroVersionSelector(QWidget):
         installed_versions_label.setFont(QFont("Arial", 14))
         self.installed_version_combo = QComboBox()
         self.installed_version_combo.setMinimumWidth(200)
-        self.populate_installed_versions()
+        # Checks the last played version in the background after startup
+        self.speculative_prepare = loaddaemon.SpeculativePrepare(self)
+        self.speculative_prepare_done = False
+        self.installed_version_combo.currentTextChanged.connect(self.on_installed_version_changed)
 
         # Create buttons layout
         buttons_layout = QVBoxLayout()
@@ -327,6 +381,10 @@ class zucaroVersionSelector(QWidget):
         # Create play button for installed versions
         self.play_button = QPushButton('Play')
         self.play_button.clicked.connect(self.play_instance)
+        # Right click offers a launch that verifies every game file
+        self.play_button.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.play_button.customContextMenuRequested.connect(self.show_play_context_menu)
+        self.verify_next_launch = False
         highlight_color = self.palette().color(QPalette.Highlight)
         self.play_button.setStyleSheet(f"background-color: {highlight_color.name()}; color: white;")
         buttons_layout.addWidget(self.play_button)
@@ -385,8 +443,8 @@ class zucaroVersionSelector(QWidget):
         QShortcut(QKeySequence(shortcuts_config.get("SettingsAlt", "Ctrl+,")), self, self.open_settings_dialog)
         QShortcut(QKeySequence(shortcuts_config.get("About", "Ctrl+I")), self, self.show_about_dialog)
         
-        QShortcut(QKeySequence(shortcuts_config.get("Refresh", "Ctrl+R")), self, self.populate_installed_versions)
-        QShortcut(QKeySequence(shortcuts_config.get("RefreshAlt", "F5")), self, self.populate_installed_versions)
+        QShortcut(QKeySequence(shortcuts_config.get("Refresh", "Ctrl+R")), self, self.refresh_installed_versions)
+        QShortcut(QKeySequence(shortcuts_config.get("RefreshAlt", "F5")), self, self.refresh_installed_versions)
         
         QShortcut(QKeySequence(shortcuts_config.get("Quit", "Ctrl+Q")), self, self.close)
 
@@ -394,8 +452,7 @@ class zucaroVersionSelector(QWidget):
         try:
             instance_name = self.config.get("Instance", "default")
             
-            command = f"instance dir {instance_name}"
-            result = modulecli.run_command(command)
+            result = modulecli.instance_dir(instance_name)
             if not result:
                 if sys.platform.startswith('linux'):
                     instance_dir = os.path.expanduser(f"~/.local/share/zucaro/instances/{instance_name}")
@@ -592,6 +649,29 @@ class zucaroVersionSelector(QWidget):
         
         java_layout.addWidget(manage_java_checkbox)
         java_layout.addWidget(manage_java_info)
+
+        # JVM profile Section
+        jvm_profile_label = QLabel("JVM profile:")
+        jvm_profile_combo = QComboBox()
+        for name, (label, minimum, _) in jvmprofiles.PROFILES.items():
+            jvm_profile_combo.addItem(label if minimum <= 8 else f"{label} (Java {minimum}+)", name)
+        current_profile = self.config.get("JvmProfile", jvmprofiles.DEFAULT_PROFILE)
+        jvm_profile_combo.setCurrentIndex(max(0, jvm_profile_combo.findData(current_profile)))
+
+        jvm_profile_info = QLabel()
+        jvm_profile_info.setWordWrap(True)
+        jvm_profile_info.setStyleSheet("font-size: 11px;")
+
+        def update_jvm_profile_info():
+            profile = jvm_profile_combo.currentData()
+            jvm_profile_info.setText(jvmprofiles.PROFILES.get(profile, ("", 8, ""))[2])
+
+        jvm_profile_combo.currentIndexChanged.connect(update_jvm_profile_info)
+        update_jvm_profile_info()
+
+        java_layout.addWidget(jvm_profile_label)
+        java_layout.addWidget(jvm_profile_combo)
+        java_layout.addWidget(jvm_profile_info)
         java_layout.addStretch()
 
         java_tab.setLayout(java_layout)
@@ -669,7 +749,8 @@ class zucaroVersionSelector(QWidget):
                 self.selected_theme,
                 java_path_input.text(),
                 ram_selector.text(),
-                manage_java_checkbox.isChecked()
+                manage_java_checkbox.isChecked(),
+                jvm_profile_combo.currentData()
             )
         )
 
@@ -691,7 +772,8 @@ class zucaroVersionSelector(QWidget):
             self.selected_theme,
             java_path_input.text(),
             ram_selector.text(),
-            manage_java_checkbox.isChecked()
+            manage_java_checkbox.isChecked(),
+            jvm_profile_combo.currentData()
         ))
         QShortcut(QKeySequence(shortcuts_config.get("CloseDialog", "Ctrl+W")), dialog, dialog.reject)
         QShortcut(QKeySequence(shortcuts_config.get("CancelDialog", "Escape")), dialog, dialog.reject)
@@ -710,7 +792,20 @@ class zucaroVersionSelector(QWidget):
             java_path_input.setText(path)
 
 
+    def on_config_changed(self, keys):
+        if keys & {"Theme", "ThemeBackground"}:
+            self.load_theme_from_file(os.path.join("themes", self.config.get("Theme", "Dark.json")))
+            self.refresh_styles()
+
+    def on_themes_changed(self):
+        self.installed_themes = None
+        if hasattr(self, 'json_files_list_widget') and self.json_files_list_widget.isVisible():
+            self.update_themes_list()
+
     def build_themes_list(self):
+        # Parsed again only after the watcher saw the themes folder change
+        if self.installed_themes is not None:
+            return list(self.installed_themes)
         themes_folder = os.path.join(os.getcwd(), "themes")
         themes_list = []
         if os.path.exists(themes_folder):
@@ -729,7 +824,8 @@ class zucaroVersionSelector(QWidget):
                     # Create display text and list item
                     display_text = f"{name}\n{description}\nBy: {author}"
                     themes_list.append((display_text, json_file))
-        return themes_list
+        self.installed_themes = themes_list
+        return list(themes_list)
 
     def populate_themes(self, json_files_list_widget, themes_list):
         json_files_list_widget.clear()
@@ -997,7 +1093,8 @@ class zucaroVersionSelector(QWidget):
         selected_theme,
         java_path,
         ram_allocation,
-        manage_java_enabled
+        manage_java_enabled,
+        jvm_profile=None
     ):
         new_shortcuts = {}
         sequences_seen = set()
@@ -1033,16 +1130,43 @@ class zucaroVersionSelector(QWidget):
             )
             return
 
-        self.save_settings(
-            is_rcp_enabled,
-            check_updates_on_start,
-            theme_background,
-            selected_theme,
-            java_path,
-            ram_allocation,
-            manage_java_enabled,
-            new_shortcuts
-        )
+        def save():
+            self.save_settings(
+                is_rcp_enabled,
+                check_updates_on_start,
+                theme_background,
+                selected_theme,
+                java_path,
+                ram_allocation,
+                manage_java_enabled,
+                new_shortcuts,
+                jvm_profile
+            )
+
+        def on_validated(result):
+            dialog.setEnabled(True)
+            error, warning = result
+            if error:
+                QMessageBox.warning(dialog, "JVM Profile", error)
+                return
+            if warning:
+                QMessageBox.information(dialog, "JVM Profile", warning)
+            save()
+
+        def on_error(error):
+            dialog.setEnabled(True)
+            QMessageBox.warning(dialog, "JVM Profile", f"Could not check the JVM profile: {error}")
+
+        # Only checked when it changes, it runs the selected java so it is
+        # done off the UI thread
+        if jvm_profile and (jvm_profile != self.config.get("JvmProfile", jvmprofiles.DEFAULT_PROFILE)
+                            or java_path != self.config.get("JavaPath", "")):
+            dialog.setEnabled(False)
+            modulecli.call_async(jvmprofiles.validate_profile, jvm_profile, java_path,
+                                 manage_java_enabled, ram_allocation).then(on_validated, on_error)
+            return
+
+        save()
 
     def save_settings(
         self,
@@ -1053,10 +1177,9 @@ class zucaroVersionSelector(QWidget):
         java_path,
         ram_allocation,
         manage_java_enabled,
-        new_shortcuts=None
+        new_shortcuts=None,
+        jvm_profile=None
     ):
-        config_path = "config.json"
-        
         # Capture old settings to see what changed
         old_theme = self.config.get("Theme")
         old_background = self.config.get("ThemeBackground")
@@ -1075,12 +1198,14 @@ class zucaroVersionSelector(QWidget):
         if new_shortcuts:
             updated_config["KeyboardShortcuts"] = new_shortcuts
 
-        self.sync_config()
+        if jvm_profile:
+            updated_config["JvmProfile"] = jvm_profile
+
         self.config.update(updated_config)
 
         try:
-            with open(config_path, "w") as config_file:
-                json.dump(self.config, config_file, indent=4)
+            # Written now so a failure shows up here
+            self.config.flush()
             
             # Apply changes live
             if selected_theme != old_theme or theme_background != old_background:
@@ -1124,8 +1249,28 @@ class zucaroVersionSelector(QWidget):
         # Get versions of installed pip packages
         installed_packages = subprocess.getoutput("pip list")
 
+        cache_stats = modulecli.cache_stats()
+        cache_info = f"Zucaro Query Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses " \
+                     f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries, " \
+                     f"{cache_stats['invalidations']} invalidations"
+
+        workers = modulecli.worker_stats()
+        if workers:
+            cache_info += "\nZucaro Workers: " + ", ".join(
+                f"#{w['index']} {'up' if w['alive'] else 'down'} ({w['restarts']} restarts)" for w in workers)
+
+        latency_info = modulecli.format_latency_stats()
+        launch_info = launchstats.format_report()
+        sessions = self.config.get("PlaySessions", [])[-5:]
+        session_info = "\n".join(gamemonitor.format_summary(session) for session in reversed(sessions)) \
+            or "No monitored sessions yet"
+
         return f"Java Version: {java_version}\nPython Version: {python_version}\nPip Version: {pip_version}\n" \
-               f"Architecture: {architecture}\nOperating System: {operating_system}\n\nPip Installed Packages:\n{installed_packages}"
+               f"Architecture: {architecture}\nOperating System: {operating_system}\n{cache_info}\n\n" \
+               f"Zucaro Command Latency:\n{latency_info}\n\n" \
+               f"Launch Timings:\n{launch_info}\n\n" \
+               f"Game Sessions:\n{session_info}\n\n" \
+               f"Pip Installed Packages:\n{installed_packages}"
 
     def show_system_info(self):
         system_info = self.get_system_info()
@@ -1155,51 +1300,30 @@ class zucaroVersionSelector(QWidget):
             # Get the instance name from config
             instance_name = self.config.get("Instance", "default")
 
-            # Run the command using modulecli
-            command = f"instance dir {instance_name}"
-            result = modulecli.run_command(command)
-            if not result:
-                print("Error: Could not retrieve game directory")
-                return
-            game_directory = result.strip()
-
-            # Open the directory in the system's file explorer
-            QDesktopServices.openUrl(QUrl.fromLocalFile(game_directory))
+            # Open the directory in the system's file explorer once zucaro answers
+            modulecli.call_async(modulecli.instance_dir, instance_name).then(
+                lambda game_directory: QDesktopServices.openUrl(QUrl.fromLocalFile(game_directory)),
+                lambda error: print(f"Error running zucaro command: {error}"))
         except Exception as e:
             print(f"Error running zucaro command: {e}")
 
     def populate_installed_versions(self):
-        config_path = "config.json"
-        
-        # Check if the config file exists
-        if not os.path.exists(config_path):
-            logging.error("Config file not found.")
-            self.populate_installed_versions_normal_order()
+        # Ask zucaro for the locally installed versions without blocking the UI,
+        # only the latest request gets to fill the combo box
+        future = modulecli.call_async(modulecli.list_versions)
+        self.installed_versions_future = future
+        future.then(lambda versions: self.fill_installed_versions(future, versions),
+                    lambda error: self.fill_installed_versions(future, []))
+
+    def fill_installed_versions(self, future, versions):
+        if future is not self.installed_versions_future:
             return
 
-        # Load config from the file
-        try:
-            with open(config_path, "r") as config_file:
-                self.config = json.load(config_file)
-        except json.JSONDecodeError as e:
-            logging.error("Failed to load config: %s", e)
-            self.populate_installed_versions_normal_order()
-            return
-
-        # Run the command and capture the output
-        try:
-            command = "version list"
-            output = modulecli.run_command(command)
-            
-            if not output:
-                self.installed_version_combo.clear()
-                return
-        except Exception:
+        versions = [version.name for version in versions]
+        if not versions:
             self.installed_version_combo.clear()
             return
 
-        versions = [version.replace('[local]', ' ').strip() for version in output.splitlines() if version.strip()]
-
         # Get the last played version from the config
         last_played = self.config.get("LastPlayed", "")
 
@@ -1211,34 +1335,40 @@ class zucaroVersionSelector(QWidget):
         # Populate the installed versions combo box
         self.installed_version_combo.clear()
         self.installed_version_combo.addItems(versions)
+
+        # Only once, right after startup
+        if last_played in versions and not self.speculative_prepare_done:
+            self.speculative_prepare_done = True
+            if self.config.get("SpeculativePrepare", True):
+                log_dir = loaddaemon.session_log_dir(self.config.get("Instance", "default"))
+                self.speculative_prepare.schedule(last_played, log_dir=log_dir)
+
+    def on_installed_version_changed(self, version):
+        if self.speculative_prepare.is_active() and not self.speculative_prepare.is_active(version):
+            self.speculative_prepare.cancel()
     
+    def refresh_installed_versions(self):
+        # An explicit refresh should never be served from the query cache
+        modulecli.invalidate("version list")
+        self.populate_installed_versions()
+
     def populate_installed_versions_normal_order(self):
-        # Run the 'zucaro instance create default' command at the start
-        try:
-            command = "instance create default"
-            output = modulecli.run_command(command)
-            if not output:
-                self.installed_version_combo.clear()
-                return
-        except Exception:
-            self.installed_version_combo.clear()
+        # Make sure the default instance exists and get the locally installed
+        # versions in a single zucaro session
+        future = modulecli.call_async(modulecli.run_batch, ["instance create default", modulecli.list_versions])
+        self.installed_versions_future = future
+        future.then(lambda results: self.fill_installed_versions_normal_order(future, results[1]),
+                    lambda error: self.fill_installed_versions_normal_order(future, []))
+
+    def fill_installed_versions_normal_order(self, future, versions):
+        if future is not self.installed_versions_future:
             return
 
-        # Run the 'zucaro version list' command and get the output
-        try:
-            command = "version list"
-            output = modulecli.run_command(command)
-            if not output:
-                self.installed_version_combo.clear()
-                return
-        except Exception:
+        versions = [version.name for version in versions]
+        if not versions:
             self.installed_version_combo.clear()
             return
 
-        # Parse the output and replace '[local]' with a space
-        versions = output.splitlines()
-        versions = [version.replace('[local]', ' ').strip() for version in versions]
-
         # Populate installed versions combo box
         self.installed_version_combo.clear()
         self.installed_version_combo.addItems(versions)
@@ -1252,27 +1382,66 @@ class zucaroVersionSelector(QWidget):
             logging.error("'marroc.py' not found.")
             QMessageBox.critical(self, "Error", "'marroc.py' not found.")
 
+    def show_play_context_menu(self, position):
+        menu = QMenu()
+        verify_action = menu.addAction("Play and Verify Game Files")
+        verify_action.setEnabled(self.play_button.isEnabled())
+        monitor_action = menu.addAction("Game Monitor")
+        monitor_action.setEnabled(gamemonitor.latest_monitor() is not None)
+        action = menu.exec_(self.play_button.mapToGlobal(position))
+        if action == verify_action:
+            self.verify_next_launch = True
+            self.play_instance()
+        elif action == monitor_action:
+            self.show_game_monitor()
+
+    def show_game_monitor(self):
+        monitor = gamemonitor.latest_monitor()
+        if monitor is None:
+            QMessageBox.information(self, "Game Monitor", "No game is running.")
+            return
+        gamemonitor.MonitorWindow(monitor, self).exec_()
+
     def play_instance(self):
+        # Still waiting on the account check of a previous click
+        if not self.play_button.isEnabled():
+            return
+
         if self.installed_version_combo.count() == 0:
             QMessageBox.warning(self, "No Version Available", "Please download a version first.")
             return
 
-        # Check if there are any accounts
-        try:
-            account_list_output = modulecli.run_command("account list")
-            if not account_list_output:
-                QMessageBox.warning(self, "No Account Available", "Please create an account first.")
-                return
-            account_list_output = account_list_output.strip()
+        # The launch checks the files itself
+        self.speculative_prepare.cancel()
+
+        # Timings of this launch, see launchstats.py
+        self.launch_timer = launchstats.LaunchTimer()
+        self.launch_timer.mark("click")
+
+        # Check if there are any accounts, the launch continues once zucaro answers
+        self.play_button.setEnabled(False)
+        modulecli.call_async(modulecli.list_accounts).then(self.play_with_accounts, self.on_accounts_error)
+
+    def on_accounts_error(self, error):
+        self.play_button.setEnabled(True)
+        error_message = f"Error fetching accounts: {error}"
+        logging.error(error_message)
+        QMessageBox.critical(self, "Error", error_message)
+
+    def play_with_accounts(self, accounts):
+        self.play_button.setEnabled(True)
+        self.launch_timer.mark("accounts_checked")
+        # Files are checked against the integrity manifest unless a full
+        # verify was asked for from the Play button menu
+        verify = True if self.verify_next_launch else "auto"
+        self.verify_next_launch = False
+        if not accounts:
+            QMessageBox.warning(self, "No Account Available", "Please create an account first.")
+            return
 
-            # Check if the selected account has a '*' (indicating it's the selected one)
-            if '*' not in account_list_output:
-                QMessageBox.warning(self, "No Account Selected", "Please select an account.")
-                return
-        except Exception as e:
-            error_message = f"Error fetching accounts: {str(e)}"
-            logging.error(error_message)
-            QMessageBox.critical(self, "Error", error_message)
+        # One of them has to be the default (selected) account
+        if not any(account.default for account in accounts):
+            QMessageBox.warning(self, "No Account Selected", "Please select an account.")
             return
 
         selected_instance = self.installed_version_combo.currentText()
@@ -1284,23 +1453,24 @@ class zucaroVersionSelector(QWidget):
             QMessageBox.warning(self, "No Instance Selected", "Please select an instance.")
             return
 
-        self.launch_game_with_window(selected_instance)
+        self.launch_game_with_window(selected_instance, verify)
 
 
-    def launch_game_with_window(self, selected_instance):
+    def launch_game_with_window(self, selected_instance, verify="auto"):
         try:
             self.current_state = selected_instance
             self.start_time = time.time()
 
-            with open('config.json', 'r') as config_file:
-                config = json.load(config_file)
-                instance_value = config.get("Instance", "default")
-                max_ram = config.get("MaxRAM", 2)
-                manage_java = config.get("ManageJava", False)
-                java_path = config.get("JavaPath", "")
+            config = self.config
+            instance_value = config.get("Instance", "default")
+            max_ram = config.get("MaxRAM", 2)
+            manage_java = config.get("ManageJava", False)
+            java_path = config.get("JavaPath", "")
+            jvm_profile = config.get("JvmProfile", jvmprofiles.DEFAULT_PROFILE)
+            self.launch_timer.mark("config_read")
+            self.launch_timer.info.update(version=selected_instance, instance=instance_value)
 
-            update_thread = threading.Thread(target=self.update_last_played, args=(selected_instance,), daemon=True)
-            update_thread.start()
+            self.update_last_played(selected_instance)
 
             command = f"instance launch {instance_value} --version-override {selected_instance} --assigned-ram {max_ram}"
             if manage_java:
@@ -1310,7 +1480,25 @@ class zucaroVersionSelector(QWidget):
 
             print(f"Launching command: {command}")
             
-            loaddaemon.launch_instance_with_window(command, self)
+            plan_request = None
+            if config.get("CacheLaunchPlans", True):
+                plan_request = dict(instance=instance_value, version=selected_instance, java=java_path,
+                                    ram=max_ram, manage_java=manage_java)
+
+            monitor = None
+            if config.get("MonitorGame", True):
+                monitor = lambda summary: self.record_play_session(summary, instance_value, selected_instance)
+
+            in_subprocess = config.get("LaunchInSubprocess", True)
+            loaddaemon.launch_instance_with_window(command, self, in_subprocess=in_subprocess,
+                                                   log_dir=loaddaemon.session_log_dir(instance_value),
+                                                   timer=self.launch_timer,
+                                                   version=selected_instance, verify=verify,
+                                                   plan_request=plan_request,
+                                                   jvm_profile=(instance_value, jvm_profile, max_ram,
+                                                                selected_instance, java_path, manage_java),
+                                                   class_data_sharing=config.get("ClassDataSharing", True),
+                                                   monitor=monitor)
 
         except Exception as e:
             error_message = f"Error playing {selected_instance}: {e}"
@@ -1321,35 +1509,21 @@ class zucaroVersionSelector(QWidget):
             self.current_state = "menu"
             self.update_total_playtime(self.start_time)
 
-    def sync_config(self):
-        """Reloads config from disk and merges with current memory state to avoid data loss."""
-        config_path = "config.json"
-        if not os.path.exists(config_path):
-            return
-
-        try:
-            with open(config_path, "r") as f:
-                disk_config = json.load(f)
-
-            disk_config.update(self.config)
-            self.config = disk_config
-        except Exception as e:
-            print(f"Warning: Failed to sync config from disk: {e}")
-
     def update_last_played(self, selected_instance):
-        self.sync_config()
-        config_path = "config.json"
         self.config["LastPlayed"] = selected_instance
-        with open(config_path, "w") as config_file:
-            json.dump(self.config, config_file, indent=4)
 
     def update_total_playtime(self, start_time):
-        self.sync_config()
-        config_path = "config.json"
-        self.config["TotalPlaytime"] += (time.time() - start_time)
-        print("TOTAL PLAYTIME:" + str(self.config["TotalPlaytime"]))
-        with open(config_path, "w") as config_file:
-            json.dump(self.config, config_file, indent=4)
+        elapsed = time.time() - start_time
+        total_playtime = self.config.modify("TotalPlaytime", lambda total: (total or 0) + elapsed, 0)
+        print("TOTAL PLAYTIME:" + str(total_playtime))
+
+    def record_play_session(self, summary, instance, version):
+        # The game never showed up, nothing worth keeping
+        if not summary.get("samples"):
+            return
+        summary.update(instance=instance, version=version)
+        print("GAME SESSION:", gamemonitor.format_summary(summary))
+        self.config.modify("PlaySessions", lambda sessions: ((sessions or []) + [summary])[-gamemonitor.MAX_SESSIONS:])
 
     def showError(self, title, message):
         QMessageBox.critical(self, title, message)
@@ -1439,21 +1613,23 @@ class zucaroVersionSelector(QWidget):
             QMessageBox.warning(dialog, "Warning", "Invalid username. Usernames must be 3-16 characters long and can only contain letters, numbers, and underscores.")
             return
 
-        try:
-            command = f"account create {username}"
-            if is_microsoft:
-                command += " --ms"
+        command = f"account create {username}"
+        if is_microsoft:
+            command += " --ms"
 
-            modulecli.run_command(command)
+        def on_created(output):
             # Re-fetch local cache of accounts if needed, but modulecli doesn't return list here
             QMessageBox.information(dialog, "Success", f"Account '{username}' created successfully!")
             self.populate_accounts_for_all_dialogs()
             dialog.accept()
-        except Exception as e:
-            error_message = f"Error creating account: {str(e)}"
+
+        def on_error(error):
+            error_message = f"Error creating account: {error}"
             logging.error(error_message)
             QMessageBox.critical(dialog, "Error", error_message)
 
+        modulecli.run_command_async(command).then(on_created, on_error)
+
     def is_valid_username(self, username):
         # Validate the username according to Minecraft's rules
         if 3 <= len(username) <= 16 and re.match(r'^[a-zA-Z0-9_]+$', username):
@@ -1482,6 +1658,8 @@ class zucaroVersionSelector(QWidget):
             QMessageBox.critical(dialog, "Error", error_message)
 
     def _on_auth_finished(self, success, message):
+        # authser edits accounts.json directly, outside of zucaro's commands
+        modulecli.invalidate("account list")
         if success:
             QMessageBox.information(self, "Success", message)
         else:
@@ -1515,22 +1693,19 @@ class zucaroVersionSelector(QWidget):
     def populate_accounts(self, account_combo):
         # Populate the account dropdown
         try:
-            command = "account list"
-            output = modulecli.run_command(command)
-            if not output:
+            accounts = modulecli.list_accounts()
+            if not accounts:
                 account_combo.clear()
                 return
             
-            accounts = output.splitlines()
             starred_account = None
             normal_accounts = []
 
             for account in accounts:
-                account = account.strip()
-                if account.startswith('*'):
-                    starred_account = account.lstrip(' *').strip()
+                if account.default:
+                    starred_account = account.name
                 else:
-                    normal_accounts.append(account)
+                    normal_accounts.append(account.name)
 
             # Clear the combo box and add accounts
             account_combo.clear()
@@ -1594,11 +1769,7 @@ class zucaroVersionSelector(QWidget):
         except (FileNotFoundError, json.JSONDecodeError):
             version_number = 'unknown version'
 
-        try:
-            with open('config.json', 'r') as config_file:
-                config_data = json.load(config_file)
-        except (FileNotFoundError, json.JSONDecodeError):
-            config_data = {}
+        config_data = self.config
 
         about_message = f"""
         <b>PicoDulce Launcher</b><br>
@@ -1761,6 +1932,8 @@ class zucaroVersionSelector(QWidget):
                     import subprocess
                     subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", "zucaro"])
                     logging.info("Successfully updated zucaro via pip.")
+                    # Drop the warm zucaro modules so the upgraded ones get imported
+                    modulecli.reload_engine()
                 except Exception as e:
                     logging.error(f"Failed to update zucaro: {e}")
                     QMessageBox.warning(self, "Warning", f"Failed to update zucaro backend: {e}")
@@ -1835,6 +2008,9 @@ class ModLoaderAndVersionMenu(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Mod Loader and Version Menu")
+        self.config = configstore.store
+        # The main window's idle check, stopped before downloads start
+        self.speculative_prepare = getattr(parent, "speculative_prepare", None) or loaddaemon.SpeculativePrepare(self)
         # Set window position relative to parent
         if parent:
             parent_pos = parent.pos()
@@ -1871,6 +2047,16 @@ class ModLoaderAndVersionMenu(QDialog):
         # Add content to "Instances" tab
         self.setup_instances_tab(instances_tab)
 
+        # The selected instance may also change in config.json on disk
+        config_watcher = getattr(parent, "config_watcher", None)
+        if config_watcher is not None:
+            config_watcher.config_changed.connect(self.on_config_changed)
+            self.finished.connect(lambda: config_watcher.config_changed.disconnect(self.on_config_changed))
+
+    def on_config_changed(self, keys):
+        if "Instance" in keys:
+            self.update_instance_label()
+            self.load_instances()
 
     def setup_instances_tab(self, instances_tab):
         layout = QVBoxLayout(instances_tab)
@@ -1888,6 +2074,10 @@ class ModLoaderAndVersionMenu(QDialog):
         self.current_instance_label.setFont(QFont("Arial", 11, QFont.Bold))
         layout.addWidget(self.current_instance_label)
 
+        self.instance_usage_label = QLabel('Disk Usage: ...')
+        self.instance_usage_label.setFont(QFont("Arial", 10))
+        layout.addWidget(self.instance_usage_label)
+
         layout.addSpacing(10)
 
         instances_label = QLabel('Available Instances:')
@@ -1949,11 +2139,8 @@ class ModLoaderAndVersionMenu(QDialog):
                 # Notify the user that the instance was created
                 QMessageBox.information(self, "Instance Created", f"Instance '{instance_name}' has been created successfully.")
 
-                # Reload the instances list
-                self.load_instances()
-
-                # Optionally select the newly created instance
-                self.on_instance_selected(self.instances_list_widget.item(self.instances_list_widget.count() - 1))
+                # Reload the instances list, then optionally select the newly created instance
+                self.load_instances().then(lambda instances: self.select_instance_by_name(instance_name))
 
             except Exception as e:
                 logging.error("Error creating instance: %s", str(e))
@@ -1973,13 +2160,8 @@ class ModLoaderAndVersionMenu(QDialog):
 
             QMessageBox.information(self, "Instance Renamed", f"Instance '{old_instance_name}' has been renamed to '{new_instance_name}' successfully.")
 
-            # Reload the instances list
-            self.load_instances()
-
-            # Optionally select the newly renamed instance
-            matching_items = self.instances_list_widget.findItems(new_instance_name, Qt.MatchExactly)
-            if matching_items:
-                self.instances_list_widget.setCurrentItem(matching_items[0])
+            # Reload the instances list, then optionally select the newly renamed instance
+            self.load_instances().then(lambda instances: self.highlight_instance(new_instance_name))
 
         except Exception as e:
             logging.error("Error renaming instance: %s", str(e))
@@ -2012,22 +2194,28 @@ class ModLoaderAndVersionMenu(QDialog):
                 QMessageBox.critical(self, "Error", f"Failed to delete instance: {str(e)}")
 
     def load_instances(self):
+        # Returns the future so callers can act on the refreshed list
+        future = modulecli.call_async(modulecli.list_instances)
+        self.instances_future = future
+        future.then(lambda instances: self.fill_instances(future, instances),
+                    lambda error: logging.error("Error fetching instances: %s", error))
+        return future
+
+    def fill_instances(self, future, instances):
+        if future is not self.instances_future:
+            return
+
         try:
-            command = "instance list"
-            output = modulecli.run_command(command)
-            if not output:
+            if not instances:
                 self.instances_list_widget.clear()
                 return
             
-            instances = output.splitlines()
             self.instances_list_widget.clear()
             
-            with open('config.json', 'r') as config_file:
-                config_data = json.load(config_file)
-                current_instance = config_data.get('Instance', 'default')
+            current_instance = self.config.get('Instance', 'default')
             
             for instance in instances:
-                instance_name = instance.strip()
+                instance_name = instance.name
                 item = QListWidgetItem(instance_name)
                 font = QFont()
                 font.setPointSize(11)
@@ -2040,6 +2228,18 @@ class ModLoaderAndVersionMenu(QDialog):
         except Exception as e:
             logging.error("Error fetching instances: %s", str(e))
 
+    def highlight_instance(self, instance_name):
+        matching_items = self.instances_list_widget.findItems(instance_name, Qt.MatchExactly)
+        if matching_items:
+            self.instances_list_widget.setCurrentItem(matching_items[0])
+            return matching_items[0]
+        return None
+
+    def select_instance_by_name(self, instance_name):
+        item = self.highlight_instance(instance_name)
+        if item:
+            self.on_instance_selected(item)
+
     def show_instance_context_menu(self, position):
         item = self.instances_list_widget.itemAt(position)
         if not item:
@@ -2079,43 +2279,45 @@ class ModLoaderAndVersionMenu(QDialog):
     def on_instance_selected(self, item):
         instance_name = item.text().strip()
 
-        config_file = 'config.json'
-
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, 'r') as file:
-                    config_data = json.load(file)
-
-                config_data['Instance'] = instance_name
-
-                with open(config_file, 'w') as file:
-                    json.dump(config_data, file, indent=4)
+        self.config['Instance'] = instance_name
+        logging.info(f"Config updated: Instance set to {instance_name}")
 
-                logging.info(f"Config updated: Instance set to {instance_name}")
-
-                self.update_instance_label()
-                self.load_instances()
-
-            except (json.JSONDecodeError, FileNotFoundError) as e:
-                logging.error(f"Error reading config.json: {e}")
-        else:
-            logging.warning(f"{config_file} not found. Unable to update instance.")
+        self.update_instance_label()
+        self.load_instances()
 
     def update_instance_label(self):
-        config_file = 'config.json'
-
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, 'r') as file:
-                    config_data = json.load(file)
-
-                current_instance = config_data.get('Instance', 'Not set')
-                self.current_instance_label.setText(f'Current Instance: {current_instance}')
-
-            except (json.JSONDecodeError, FileNotFoundError) as e:
-                logging.error(f"Error reading config.json: {e}")
-        else:
-            self.current_instance_label.setText('Current Instance: Not set')
+        current_instance = self.config.get('Instance', 'Not set')
+        self.current_instance_label.setText(f'Current Instance: {current_instance}')
+
+        # Sized off the GUI thread, only the latest request updates the label
+        self.instance_usage_label.setText('Disk Usage: ...')
+        future = modulecli.call_async(self.instance_disk_usage, current_instance)
+        self.instance_usage_future = future
+        future.then(lambda sizes: self.show_instance_usage(future, sizes),
+                    lambda error: self.show_instance_usage(future, None))
+
+    def instance_disk_usage(self, instance_name):
+        root = modulecli.instance_dir(instance_name)
+        # Region files grow while the game runs, their sizes are re-read
+        sizer = dirsize.FolderSizer(restat=True)
+        sizes = sizer.folder_sizes(root)
+        # Worlds, mods and the rest of the game's folders, a second pass
+        # over a tree the first one just sized
+        game_sizes = sizer.folder_sizes(os.path.join(root, "minecraft")) if "minecraft" in sizes else {}
+        return sum(sizes.values()), game_sizes
+
+    def show_instance_usage(self, future, usage):
+        if future is not self.instance_usage_future:
+            return
+        if usage is None:
+            self.instance_usage_label.setText('Disk Usage: unknown')
+            return
+        total, game_sizes = usage
+        biggest = sorted((item for item in game_sizes.items() if item[0] != "." and item[1]),
+                         key=lambda item: item[1], reverse=True)[:3]
+        details = ", ".join(f"{name} {loaddaemon.format_size(size)}" for name, size in biggest)
+        text = f'Disk Usage: {loaddaemon.format_size(total)}'
+        self.instance_usage_label.setText(text + (f' ({details})' if details else ''))
 
 
     def setup_install_mod_loader_tab(self, install_mod_tab):
@@ -2194,29 +2396,23 @@ class ModLoaderAndVersionMenu(QDialog):
 
         def update_versions():
             self.version_combo.clear()
-            options = []
+            options = {}
             if self.release_checkbox.isChecked():
-                options.append('--release')
+                options['release'] = True
             if self.snapshot_checkbox.isChecked():
-                options.append('--snapshot')
+                options['snapshot'] = True
             if self.alpha_checkbox.isChecked():
-                options.append('--alpha')
+                options['alpha'] = True
             if self.beta_checkbox.isChecked():
-                options.append('--beta')
+                options['beta'] = True
             if options:
                 try:
-                    command = 'version list ' + ' '.join(options)
-                    output = modulecli.run_command(command)
-                    if not output or "Error" in output:
-                        if not output:
-                            logging.error("Empty response from modulecli")
-                        else:
-                            logging.error(output)
+                    versions = modulecli.list_versions(**options)
+                    if not versions:
+                        logging.error("Empty response from modulecli")
                         return
 
-                    versions = output.splitlines()
-                    versions = [version.replace('[local]', ' ').strip() for version in versions]
-                    self.version_combo.addItems(versions)
+                    self.version_combo.addItems([version.name for version in versions])
                 except Exception as e:
                     logging.error("Unexpected error: %s", e)
                     return
@@ -2237,6 +2433,11 @@ class ModLoaderAndVersionMenu(QDialog):
         # Shortcut for Download Version
         QShortcut(QKeySequence("Ctrl+D"), download_version_tab, lambda: self.download_version(self.version_combo.currentText()))
 
+        # Prepare several of the listed versions at once
+        self.download_several_button = QPushButton('Download Several...')
+        self.download_several_button.clicked.connect(self.download_several_versions)
+        layout.addWidget(self.download_several_button)
+
         # Connect the combo box signal to the update function
         self.version_combo.currentIndexChanged.connect(self.update_download_button_state)
         
@@ -2246,18 +2447,54 @@ class ModLoaderAndVersionMenu(QDialog):
     def update_download_button_state(self):
         self.download_button.setEnabled(self.version_combo.currentIndex() != -1)
 
+    def session_log_dir(self):
+        return loaddaemon.session_log_dir(self.config.get("Instance", "default"))
+
     def download_version(self, version):
-        success = loaddaemon.prepare_version_with_window(version, self)
+        self.speculative_prepare.cancel()
+        success = loaddaemon.prepare_version_with_window(version, self, log_dir=self.session_log_dir())
         if success:
             QMessageBox.information(self, "Success", f"Version {version} prepared successfully!")
         else:
             QMessageBox.critical(self, "Error", f"Failed to prepare version {version}.")
 
+    def download_several_versions(self):
+        versions = [self.version_combo.itemText(i) for i in range(self.version_combo.count())]
+        if not versions:
+            QMessageBox.warning(self, "No Versions", "There are no versions to download.")
+            return
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle('Download Several Versions')
+        layout = QVBoxLayout(dialog)
+        layout.addWidget(QLabel('Select the versions to download:'))
+        versions_list = QListWidget()
+        versions_list.setSelectionMode(QListWidget.MultiSelection)
+        versions_list.addItems(versions)
+        layout.addWidget(versions_list)
+        download_button = QPushButton('Download')
+        download_button.clicked.connect(dialog.accept)
+        layout.addWidget(download_button)
+
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        selected = [item.text() for item in versions_list.selectedItems()]
+        if not selected:
+            return
+
+        max_parallel = self.config.get("MaxParallelPrepares", loaddaemon.DEFAULT_PARALLEL_PREPARES)
+        self.speculative_prepare.cancel()
+        results = loaddaemon.prepare_versions_with_window(selected, self, max_parallel, log_dir=self.session_log_dir())
+        failed = [version for version, success in results.items() if not success]
+        if failed:
+            QMessageBox.critical(self, "Error", f"Failed to prepare: {', '.join(failed)}")
+        else:
+            QMessageBox.information(self, "Success", f"Prepared {len(results)} versions successfully!")
+
     def populate_available_releases(self, version_combo, install_forge, install_fabric, install_quilt):
         try:
-            command = "version list --release"
-            output = modulecli.run_command(command)
-            if not output:
+            versions = [version.name for version in modulecli.list_versions(release=True)]
+            if not versions:
                 logging.error("Empty response from modulecli")
                 return
         except Exception as e:
@@ -2265,11 +2502,11 @@ class ModLoaderAndVersionMenu(QDialog):
             return
 
         if install_fabric or install_quilt:
-            releases = [version for version in output.splitlines() if version.startswith("1.") and int(version.split('.')[1]) >= 14]
+            releases = [version for version in versions if version.startswith("1.") and int(version.split('.')[1]) >= 14]
         elif install_forge:
-            releases = [version for version in output.splitlines() if version.startswith("1.") and float(version.split('.')[1]) >= 5]
+            releases = [version for version in versions if version.startswith("1.") and float(version.split('.')[1]) >= 5]
         else:
-            releases = output.splitlines()
+            releases = versions
 
         version_combo.clear()
         version_combo.addItems(releases)
@@ -2279,6 +2516,7 @@ class ModLoaderAndVersionMenu(QDialog):
             QMessageBox.warning(self, "Select Mod Loader", "Please select at least one mod loader.")
             return
 
+        self.speculative_prepare.cancel()
         mod_loader = None
         if install_forge:
             mod_loader = 'forge'
@@ -2319,6 +2557,6 @@ if __name__ == '__main__':
         app.setWindowIcon(QIcon('holiday.ico'))  # Set holiday icon
     else:
         app.setWindowIcon(QIcon('launcher_icon.ico'))  # Set regular icon
-    window = zucaroVersionSelector()
-    window.show()
+    # Shown by its startup graph, --profile-startup prints the step timings
+    window = zucaroVersionSelector(profile_startup="--profile-startup" in sys.argv)
     sys.exit(app.exec_())
@@ -0,0 +1,199 @@
+import os
+import re
+import gzip
+import time
+import threading
+from collections import deque
+
+# Folder inside the instance directory the session logs go to
+LOG_FOLDER = "picodulce-logs"
+
+# Lines of a session kept in memory for tail()
+RING_LINES = 5000
+
+# Uncompressed bytes per log file before rotating to the next part
+MAX_PART_BYTES = 8 * 1024 * 1024
+
+# Parts kept per session, the oldest are deleted first
+MAX_PARTS = 5
+
+# Sessions of each kind kept per instance
+MAX_SESSIONS = 20
+
+# Bytes buffered in memory before they are compressed to disk
+SPILL_BYTES = 64 * 1024
+
+# GC log the JVM writes next to a launch session, see gamemonitor.py
+GC_LOG_SUFFIX = ".gc.log"
+
+
+class SessionLog:
+    """Log of one launch or prepare.
+
+    The last RING_LINES lines stay in memory, everything is spilled to
+    gzip files under <instance>/picodulce-logs. Files are rotated every
+    MAX_PART_BYTES and only the newest MAX_PARTS are kept, so a game that
+    runs for hours can't fill the disk or the memory."""
+
+    def __init__(self, log_dir, kind="launch", ring_size=RING_LINES):
+        self.log_dir = log_dir
+        self.ring = deque(maxlen=ring_size)
+        self.lock = threading.Lock()
+        # Dots separate the parts of a session, keep them out of its name
+        kind = kind.replace(".", "_")
+        self.kind = kind
+        self.session = f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}"
+        self.part = 0
+        self.part_bytes = 0
+        self.pending = []
+        self.pending_bytes = 0
+        self.file = None
+        self.closed = False
+
+        os.makedirs(log_dir, exist_ok=True)
+        prune_sessions(log_dir, kind, MAX_SESSIONS - 1)
+        # Two sessions started within the same second
+        base, count = self.session, 1
+        while session_paths(log_dir, self.session):
+            count += 1
+            self.session = f"{base}-{count}"
+        self._open_part()
+
+    def _part_path(self, part):
+        suffix = "" if part == 0 else f".{part}"
+        return os.path.join(self.log_dir, f"{self.session}{suffix}.log.gz")
+
+    def _open_part(self):
+        self.file = gzip.open(self._part_path(self.part), "at", encoding="utf-8")
+        self.part_bytes = 0
+        # Drop parts that fell out of the window
+        stale = self.part - MAX_PARTS
+        if stale >= 0 and os.path.exists(self._part_path(stale)):
+            os.remove(self._part_path(stale))
+
+    def write(self, line):
+        line = line.rstrip("\r\n")
+        with self.lock:
+            if self.closed:
+                return
+            self.ring.append(line)
+            self.pending.append(line)
+            self.pending_bytes += len(line) + 1
+            if self.pending_bytes >= SPILL_BYTES:
+                self._spill()
+
+    def _spill(self):
+        if not self.pending:
+            return
+        data = "\n".join(self.pending) + "\n"
+        self.pending = []
+        self.pending_bytes = 0
+        try:
+            self.file.write(data)
+            self.part_bytes += len(data)
+            if self.part_bytes >= MAX_PART_BYTES:
+                self.file.close()
+                self.part += 1
+                self._open_part()
+        except OSError as e:
+            print(f"Error writing session log: {e}")
+
+    def flush(self):
+        with self.lock:
+            if self.closed:
+                return
+            self._spill()
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self._spill()
+            self.file.close()
+            self.closed = True
+
+    def tail(self, n=100):
+        with self.lock:
+            return list(self.ring)[-n:] if n else []
+
+    def paths(self):
+        return session_paths(self.log_dir, self.session)
+
+    def search(self, pattern, ignore_case=True):
+        # Everything written so far, including lines no longer in memory
+        self.flush()
+        return search_session(self.log_dir, self.session, pattern, ignore_case)
+
+
+def session_paths(log_dir, session):
+    # Parts of a session, oldest first
+    paths = []
+    prefix = session + "."
+    for name in os.listdir(log_dir):
+        if name == f"{session}.log.gz":
+            paths.append((0, name))
+        elif name.startswith(prefix) and name.endswith(".log.gz"):
+            part = name[len(prefix):-len(".log.gz")]
+            if part.isdigit():
+                paths.append((int(part), name))
+    return [os.path.join(log_dir, name) for _, name in sorted(paths)]
+
+
+def list_sessions(log_dir, kind=None):
+    """Session names in log_dir, newest first."""
+    if not os.path.isdir(log_dir):
+        return []
+    sessions = set()
+    for name in os.listdir(log_dir):
+        if not name.endswith(".log.gz"):
+            continue
+        session = name[:-len(".log.gz")].split(".")[0]
+        if kind is None or session.startswith(kind + "-"):
+            sessions.add(session)
+    return sorted(sessions, reverse=True)
+
+
+def prune_sessions(log_dir, kind, keep):
+    for session in list_sessions(log_dir, kind)[keep:]:
+        gc_logs = [os.path.join(log_dir, name) for name in os.listdir(log_dir)
+                   if name.startswith(session + GC_LOG_SUFFIX)]
+        for path in session_paths(log_dir, session) + gc_logs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def read_session(log_dir, session):
+    """Yield the lines of a session, it may still be written to."""
+    for path in session_paths(log_dir, session):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8", errors="replace") as log_file:
+                for line in log_file:
+                    yield line.rstrip("\n")
+        except (EOFError, OSError):
+            # A part that is still open has no gzip trailer yet
+            continue
+
+
+def tail_session(log_dir, session, n=100):
+    return list(deque(read_session(log_dir, session), maxlen=n))
+
+
+def search_session(log_dir, session, pattern, ignore_case=True):
+    """(line number, line) pairs of a session matching the regex pattern."""
+    regex = re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+    return [(number, line) for number, line in enumerate(read_session(log_dir, session), start=1)
+            if regex.search(line)]
+
+
+def open_session_log(log_dir, kind):
+    # Logging must never stop a launch, None when the folder isn't writable
+    if not log_dir:
+        return None
+    try:
+        return SessionLog(log_dir, kind)
+    except OSError as e:
+        print(f"Error creating session log in {log_dir}: {e}")
+        return None
@@ -0,0 +1,136 @@
+import time
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import Qt, QObject, pyqtSignal
+
+# Threads running the steps that don't touch widgets
+STARTUP_WORKERS = 4
+
+
+class Step:
+    def __init__(self, name, func, after=(), gui=False, critical=False):
+        self.name = name
+        self.func = func
+        self.after = list(after)
+        self.gui = gui
+        self.critical = critical
+        # waiting, running, done, failed or skipped
+        self.state = "waiting"
+        self.started = None
+        self.ended = None
+        self.error = None
+
+
+class StartupGraph(QObject):
+    """Startup steps run as soon as the steps they come after are done.
+
+    gui steps run on the GUI thread once its event loop is up, the others
+    on a small thread pool, so independent steps overlap. A step that
+    fails skips everything after it; failed is emitted when it was
+    critical. finished is emitted once every step ended."""
+
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+    _run_on_gui = pyqtSignal(object)
+
+    def __init__(self, parent=None, workers=STARTUP_WORKERS):
+        super().__init__(parent)
+        self.steps = {}
+        self.lock = threading.Lock()
+        self.workers = workers
+        self.executor = None
+        self.started = None
+        self.ended = None
+        # Queued even from the GUI thread, a step never runs inside another
+        self._run_on_gui.connect(self._run_step, Qt.QueuedConnection)
+
+    def add(self, name, func, after=(), gui=False, critical=False):
+        self.steps[name] = Step(name, func, after, gui, critical)
+
+    def start(self):
+        for step in self.steps.values():
+            missing = [name for name in step.after if name not in self.steps]
+            if missing:
+                raise ValueError(f"Startup step {step.name} comes after unknown steps: {', '.join(missing)}")
+        self.started = time.monotonic()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="startup")
+        self._schedule()
+
+    def _schedule(self):
+        ready = []
+        with self.lock:
+            changed = True
+            while changed:
+                changed = False
+                for step in self.steps.values():
+                    if step.state != "waiting":
+                        continue
+                    states = [self.steps[name].state for name in step.after]
+                    if any(state in ("failed", "skipped") for state in states):
+                        step.state = "skipped"
+                        changed = True
+                    elif all(state == "done" for state in states):
+                        step.state = "running"
+                        ready.append(step)
+            finished = self.ended is None and all(step.state in ("done", "failed", "skipped")
+                                                  for step in self.steps.values())
+            if finished:
+                self.ended = time.monotonic()
+
+        for step in ready:
+            if step.gui:
+                self._run_on_gui.emit(step)
+            else:
+                self.executor.submit(self._run_step, step)
+        if finished:
+            self.executor.shutdown(wait=False)
+            self.finished.emit()
+
+    def _run_step(self, step):
+        step.started = time.monotonic()
+        try:
+            step.func()
+            state = "done"
+        except Exception:
+            step.error = traceback.format_exc()
+            print(f"Startup step {step.name} failed:\n{step.error}")
+            state = "failed"
+        step.ended = time.monotonic()
+        with self.lock:
+            step.state = state
+        if state == "failed" and step.critical:
+            self.failed.emit(step.name)
+        self._schedule()
+
+    def critical_path(self):
+        # From the step that ended last back through whatever held it up
+        ended = [step for step in self.steps.values() if step.ended is not None]
+        if not ended:
+            return []
+        step = max(ended, key=lambda step: step.ended)
+        path = [step]
+        while True:
+            before = [self.steps[name] for name in step.after if self.steps[name].ended is not None]
+            if not before:
+                break
+            step = max(before, key=lambda step: step.ended)
+            path.append(step)
+        return [step.name for step in reversed(path)]
+
+    def report(self):
+        def ms(seconds):
+            return f"{seconds * 1000:.1f} ms"
+
+        total = (self.ended or time.monotonic()) - self.started
+        lines = [f"Startup: {ms(total)}"]
+        width = max(len(name) for name in self.steps)
+        for step in sorted(self.steps.values(), key=lambda step: step.started or float("inf")):
+            thread = "gui" if step.gui else "worker"
+            if step.started is None:
+                lines.append(f"  {step.name:<{width}}  {thread:<6}  {step.state}")
+                continue
+            lines.append(f"  {step.name:<{width}}  {thread:<6}  at {ms(step.started - self.started):>10}"
+                         f"  took {ms((step.ended or time.monotonic()) - step.started):>10}  {step.state}")
+        lines.append("Critical path: " + " > ".join(self.critical_path()))
+        return "\n".join(lines)